@@ -3,47 +3,174 @@
 # ==========================================================
 
 
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 from fastapi import Depends, HTTPException, Request
-from jose import jwt, JWTError
-from core.security import SECRET_KEY, ALGORITHM
-from core.database import get_connection
+from fastapi.concurrency import run_in_threadpool
+from core.security import decode_access_token
+from core.database import get_connection, release_connection
+from core.async_db import ACQUIRE_TIMEOUT_S, get_async_pool
+
+
+# ----------------------------------------------------------
+# JWT -> user lookup cache (LRU + TTL)
+# Keyed by sha256(token), never the raw token.
+# ----------------------------------------------------------
+
+USER_CACHE_MAX_ENTRIES = 10_000
+USER_CACHE_TTL_SECONDS = 60
+
+_user_cache: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (expires_at, user)
+_user_cache_lock = threading.Lock()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cache_get(key: str):
+    with _user_cache_lock:
+        entry = _user_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            del _user_cache[key]
+            return None
+        _user_cache.move_to_end(key)
+        return user
+
+
+def _cache_put(key: str, user: dict, ttl: float):
+    if ttl <= 0:
+        return
+    with _user_cache_lock:
+        _user_cache[key] = (time.monotonic() + ttl, user)
+        _user_cache.move_to_end(key)
+        while len(_user_cache) > USER_CACHE_MAX_ENTRIES:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_token(token: str):
+    """Drop the cached user for one session token (e.g. on logout)"""
+    if not token:
+        return
+    with _user_cache_lock:
+        _user_cache.pop(_token_key(token), None)
+
+
+def invalidate_user(user_id: int):
+    """Drop every cached session for a user (e.g. after profile changes)"""
+    with _user_cache_lock:
+        stale = [k for k, (_, user) in _user_cache.items() if user["user_id"] == user_id]
+        for k in stale:
+            del _user_cache[k]
+
+
+def get_db():
+    """
+    Yield a pooled DB connection for the lifetime of one request.
+    FastAPI caches this per request, so every dependency of a route
+    shares the same connection. Always released, even on errors.
+    """
+    con = get_connection()
+    try:
+        yield con
+    finally:
+        release_connection(con)
 
 
-def get_current_user(request: Request):
+async def get_db_conn():
     """
-    Extract user from JWT cookie and return full user data
+    Yield an asyncpg connection for the lifetime of one request.
+    Used by the async (pure-IO) routes; 503 if the pool isn't up.
+    """
+    pool = get_async_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    async with pool.acquire(timeout=ACQUIRE_TIMEOUT_S) as con:
+        yield con
+
+
+def _lookup_user(user_id: int) -> dict:
+    """Fetch {user_id, email, role} from the DB (tokens issued before claims were embedded)"""
+    con = get_connection()
+    cur = con.cursor()
+    try:
+        cur.execute("EXECUTE user_by_id (%s)", (user_id,))
+        user = cur.fetchone()
+    finally:
+        cur.close()
+        release_connection(con)
+
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    return {
+        "user_id": user['user_id'],
+        "email": user['email'],
+        "role": user['role']
+    }
+
+
+async def _lookup_user_async(user_id: int) -> dict:
+    """Same as _lookup_user, but on the asyncpg pool when it's available"""
+    pool = get_async_pool()
+    if pool is None:
+        return await run_in_threadpool(_lookup_user, user_id)
+
+    user = await pool.fetchrow(
+        "SELECT user_id, email, role FROM users WHERE user_id = $1",
+        user_id,
+        timeout=ACQUIRE_TIMEOUT_S,
+    )
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    return {
+        "user_id": user['user_id'],
+        "email": user['email'],
+        "role": user['role']
+    }
+
+
+async def get_current_user(request: Request):
+    """
+    Extract user from JWT cookie and return full user data.
+    email and role are read straight from the token claims; only legacy
+    tokens that carry just "sub" fall back to a users-table lookup.
     """
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
+    key = _token_key(token)
+    cached = _cache_get(key)
+    if cached is not None:
+        return dict(cached)
+
+    payload = decode_access_token(token)
     try:
-        # Decode JWT to get user_id
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = int(payload["sub"])
-        
-        # Fetch full user data from database
-        con = get_connection()
-        cur = con.cursor()
-        
-        try:
-            cur.execute(
-                "SELECT user_id, email, role FROM users WHERE user_id = %s",
-                (user_id,)
-            )
-            user = cur.fetchone()
-            
-            if not user:
-                raise HTTPException(status_code=401, detail="User not found")
-            
-            return {
-                "user_id": user['user_id'],
-                "email": user['email'],
-                "role": user['role']
-            }
-        finally:
-            cur.close()
-            con.close()
-            
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
\ No newline at end of file
+    except (TypeError, KeyError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    if "email" in payload and "role" in payload:
+        result = {
+            "user_id": user_id,
+            "email": payload["email"],
+            "role": payload["role"]
+        }
+    else:
+        result = await _lookup_user_async(user_id)
+
+    # Never cache past the token's own expiry
+    ttl = USER_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    _cache_put(key, result, ttl)
+
+    return dict(result)
@@ -0,0 +1,37 @@
+# ==========================================================
+# ASGI MIDDLEWARE
+# ==========================================================
+
+from starlette.responses import PlainTextResponse
+
+
+class MaxBodySizeMiddleware:
+    """
+    Reject requests whose Content-Length exceeds max_bytes with a 413
+    before the route (or multipart parsing) ever runs.
+    Only paths starting with one of `paths` are checked; other routes
+    (e.g. chat attachments) keep their own limits.
+    Chunked uploads without a Content-Length still hit the per-route
+    streaming size check.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: tuple):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.paths):
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    try:
+                        too_large = int(value) > self.max_bytes
+                    except ValueError:
+                        too_large = False
+                    if too_large:
+                        response = PlainTextResponse("Request body too large", status_code=413)
+                        await response(scope, receive, send)
+                        return
+                    break
+
+        await self.app(scope, receive, send)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Request, Response, Depends
-from core.database import get_connection
-from core.security import hash_password, verify_password, create_access_token
-from api.deps import get_current_user
+import json
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response, Depends
+from fastapi.concurrency import run_in_threadpool
+from core.auth_log import log_auth_event
+from core.logger import get_logger
+from core.database import get_connection, release_connection
+from core.security import hash_password_async, verify_password_async, needs_rehash, create_access_token
+from api.deps import get_current_user, get_db, invalidate_token
 from schemas.auth import (
     RegisterRequest,
     LoginRequest,
@@ -10,6 +15,7 @@ from schemas.auth import (
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+logger = get_logger("auth")
 
 
 # ==========================================================
@@ -21,73 +27,71 @@ router = APIRouter(prefix="/auth", tags=["auth"])
     response_model=UserResponse,
     status_code=201
 )
-def register(
+async def register(
     data: RegisterRequest,
     request: Request,
-    response: Response
+    response: Response,
+    con=Depends(get_db)
 ):
-    con = get_connection()
-    cur = con.cursor()
     client_ip = request.client.host
 
+    # bcrypt is CPU-bound — hash on the dedicated pool, not the event loop
+    password_hash = await hash_password_async(data.password)
+
     try:
-        # Check if user exists
-        cur.execute("SELECT user_id FROM users WHERE email = %s", (data.email,))
-        if cur.fetchone():
-            raise HTTPException(status_code=400, detail="Email already registered")
+        result = await run_in_threadpool(_insert_user, con, data.email, password_hash, client_ip)
+    except Exception as e:
+        logger.error(f"Registration error: {e}")
+        raise HTTPException(status_code=500, detail="Registration failed")
+
+    if not result:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    user_id = result['user_id']
+    role = result['role']
+
+    # Create session cookie
+    token = create_access_token({"sub": str(user_id), "email": data.email, "role": role})
+    _set_session_cookie(response, token)
+
+    return {
+        "user_id": user_id,
+        "email": data.email,
+        "role": role
+    }
 
-        # Create user
+
+def _insert_user(con, email: str, password_hash: str, client_ip: str):
+    """
+    Create the user and its 'success' auth_logs row in one statement.
+    Returns {user_id, role}, or None if the email is taken (nothing is logged then).
+    """
+    cur = con.cursor()
+    try:
+        # The UNIQUE(email) conflict doubles as the exists-check
         cur.execute(
             """
-            INSERT INTO users (email, password_hash)
-            VALUES (%s, %s)
-            RETURNING user_id, role
+            WITH new_user AS (
+                INSERT INTO users (email, password_hash)
+                VALUES (%s, %s)
+                ON CONFLICT (email) DO NOTHING
+                RETURNING user_id, role
+            ), logged AS (
+                INSERT INTO auth_logs (user_id, auth_status, ip_address)
+                SELECT user_id, 'success', %s FROM new_user
+            )
+            SELECT user_id, role FROM new_user
             """,
-            (data.email, hash_password(data.password))
+            (email, password_hash, client_ip)
         )
-
         result = cur.fetchone()
-        user_id = result['user_id']
-        role = result['role']
-
-        # Log auth
-        cur.execute(
-            "INSERT INTO auth_logs (user_id, auth_status, ip_address) VALUES (%s, %s, %s)",
-            (user_id, "success", client_ip)
-        )
-
         con.commit()
-
-        # Create session cookie
-        token = create_access_token({"sub": str(user_id)})
-        
-       
-        response.set_cookie(
-            key="access_token",
-            value=token,
-            httponly=True,
-            secure=False,           # False for localhost (HTTP)
-            samesite="lax",        
-            path="/",
-            max_age=60 * 60 * 24    # 24 hours
-        )
-
-        return {
-            "user_id": user_id,
-            "email": data.email,
-            "role": role
-        }
-    
-    except HTTPException:
+        return result
+    except Exception:
         con.rollback()
         raise
-    except Exception as e:
-        con.rollback()
-        print(f"Registration error: {e}")
-        raise HTTPException(status_code=500, detail="Registration failed")
     finally:
         cur.close()
-        con.close()
 
 
 # ==========================================================
@@ -98,89 +102,114 @@ def register(
     "/login",
     response_model=UserResponse
 )
-def login(
+async def login(
     data: LoginRequest,
     request: Request,
-    response: Response
+    response: Response,
+    background_tasks: BackgroundTasks,
+    con=Depends(get_db)
 ):
-    con = get_connection()
-    cur = con.cursor()
     client_ip = request.client.host
 
     try:
-        cur.execute(
-            "SELECT user_id, password_hash, role FROM users WHERE email = %s",
-            (data.email,)
-        )
-        row = cur.fetchone()
-
-        if not row or not verify_password(data.password, row['password_hash']):
-            # Log failed attempt
-            if row:
-                cur.execute(
-                    "INSERT INTO auth_logs (user_id, auth_status, ip_address) VALUES (%s, %s, %s)",
-                    (row['user_id'], "failed", client_ip)
-                )
-                con.commit()
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        user_id = row['user_id']
-        role = row['role']
-
-        # Log success
-        cur.execute(
-            "INSERT INTO auth_logs (user_id, auth_status, ip_address) VALUES (%s, %s, %s)",
-            (user_id, "success", client_ip)
-        )
+        row = await run_in_threadpool(_fetch_login_row, con, data.email)
+    except Exception as e:
+        logger.error(f"Login error: {e}")
+        raise HTTPException(status_code=500, detail="Login failed")
 
-        con.commit()
+    if not row or not await verify_password_async(data.password, row['password_hash']):
+        # Log failed attempt
+        if row:
+            log_auth_event(row['user_id'], "failed", client_ip)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        # Create cookie
-        token = create_access_token({"sub": str(user_id)})
-        
-       
-        response.set_cookie(
-            key="access_token",
-            value=token,
-            httponly=True,
-            secure=False,           # False for localhost (HTTP)
-            samesite="lax",        
-            path="/",
-            max_age=60 * 60 * 24    # 24 hours
-        )
+    user_id = row['user_id']
+    role = row['role']
 
-        return {
-            "user_id": user_id,
-            "email": data.email,
-            "role": role
-        }
-    
-    except HTTPException:
-        con.rollback()
-        raise
+    # Log success
+    log_auth_event(user_id, "success", client_ip)
+
+    # Migrate hashes made at an old bcrypt cost, after the response is sent
+    if needs_rehash(row['password_hash']):
+        background_tasks.add_task(_rehash_password, user_id, data.password)
+
+    # Create cookie
+    token = create_access_token({"sub": str(user_id), "email": data.email, "role": role})
+    _set_session_cookie(response, token)
+
+    return {
+        "user_id": user_id,
+        "email": data.email,
+        "role": role
+    }
+
+
+def _fetch_login_row(con, email: str):
+    cur = con.cursor()
+    try:
+        cur.execute("EXECUTE login_by_email (%s)", (email,))
+        return cur.fetchone()
+    finally:
+        cur.close()
+
+
+async def _rehash_password(user_id: int, password: str):
+    """Re-hash at the current BCRYPT_ROUNDS and store it (runs as a background task)"""
+    try:
+        password_hash = await hash_password_async(password)
+        await run_in_threadpool(_store_password_hash, user_id, password_hash)
     except Exception as e:
+        logger.error(f"Password rehash failed for user {user_id}: {e}")
+
+
+def _store_password_hash(user_id: int, password_hash: str):
+    # Own connection: the request's get_db connection is released before background tasks run
+    con = get_connection()
+    cur = con.cursor()
+    try:
+        cur.execute(
+            "UPDATE users SET password_hash = %s WHERE user_id = %s",
+            (password_hash, user_id)
+        )
+        con.commit()
+    except Exception:
         con.rollback()
-        print(f"Login error: {e}")
-        raise HTTPException(status_code=500, detail="Login failed")
+        raise
     finally:
         cur.close()
-        con.close()
+        release_connection(con)
+
+
+def _set_session_cookie(response: Response, token: str):
+    response.set_cookie(
+        key="access_token",
+        value=token,
+        httponly=True,
+        secure=False,           # False for localhost (HTTP)
+        samesite="lax",
+        path="/",
+        max_age=60 * 60 * 24    # 24 hours
+    )
 
 
 # ==========================================================
 # LOGOUT
 # ==========================================================
 
+_LOGOUT_BODY = json.dumps({"message": "Logged out successfully"}).encode()
+_LOGOUT_HEADERS = {
+    "set-cookie": 'access_token=""; expires=Thu, 01 Jan 1970 00:00:00 GMT; Max-Age=0; Path=/; SameSite=lax'
+}
+
+
 @router.post(
     "/logout",
     response_model=MessageResponse
 )
-def logout(response: Response):
-    response.delete_cookie(
-        key="access_token",
-        path="/",
-        samesite="lax"  )
-    return {"message": "Logged out successfully"}
+def logout(request: Request):
+    invalidate_token(request.cookies.get("access_token"))
+    # Same bytes every time — skip response-model validation and cookie building
+    return Response(_LOGOUT_BODY, media_type="application/json", headers=_LOGOUT_HEADERS)
 
 
 # ==========================================================
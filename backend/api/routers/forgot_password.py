@@ -20,8 +20,8 @@ from typing import Dict, Tuple
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
 
-from core.database import get_connection
-from core.security import hash_password
+from core.database import get_connection, release_connection
+from core.security import hash_password_async
 
 router = APIRouter(prefix="/api", tags=["forgot-password"])
 
@@ -131,11 +131,11 @@ async def forgot_password(data: ForgotPasswordRequest):
     conn = get_connection()
     cur  = conn.cursor()
     try:
-        cur.execute("SELECT user_id FROM users WHERE email = %s", (data.email,))
+        cur.execute("EXECUTE user_id_by_email (%s)", (data.email,))
         user = cur.fetchone()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     if user:
         otp = _generate_otp()   # fresh random code every single time
@@ -189,12 +189,14 @@ async def reset_password(data: ResetPasswordRequest):
         _reset_token_store.pop(data.reset_token, None)
         raise HTTPException(status_code=400, detail="Reset token has expired")
 
+    password_hash = await hash_password_async(data.new_password)
+
     conn = get_connection()
     cur  = conn.cursor()
     try:
         cur.execute(
             "UPDATE users SET password_hash = %s WHERE email = %s RETURNING user_id",
-            (hash_password(data.new_password), email),
+            (password_hash, email),
         )
         if not cur.fetchone():
             raise HTTPException(status_code=404, detail="User not found")
@@ -206,7 +208,7 @@ async def reset_password(data: ResetPasswordRequest):
         raise HTTPException(status_code=500, detail="Password reset failed")
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     _reset_token_store.pop(data.reset_token, None)   # consume — can't reuse
     return {"message": "Password reset successfully"}
\ No newline at end of file
@@ -7,16 +7,18 @@ POST /api/profile/avatar   → upload a new avatar (multipart)
 """
 
 import os
-import uuid
-import shutil
+import hashlib
+import tempfile
 from pathlib import Path
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-from api.routers.auth import get_current_user
-from core.database import get_profile, upsert_profile, update_profile_avatar
+from api.deps import get_current_user, get_db_conn, invalidate_user
+from core.config import AVATAR_BASE_URL
+from core.database import update_profile_avatar
 
 router = APIRouter(prefix="/api/profile", tags=["profile"])
 
@@ -27,6 +29,7 @@ AVATAR_DIR.mkdir(parents=True, exist_ok=True)
 
 ALLOWED_MIME = {"image/jpeg", "image/png", "image/webp", "image/gif"}
 MAX_SIZE_BYTES = 2 * 1024 * 1024  # 2 MB
+UPLOAD_CHUNK_BYTES = 64 * 1024    # read uploads 64 KB at a time
 
 
 # ── Schemas ────────────────────────────────────────────────────────────────
@@ -44,10 +47,27 @@ class ProfileUpdate(BaseModel):
     bio:       Optional[str] = None
 
 
+# ── Queries (asyncpg) ──────────────────────────────────────────────────────
+
+_SELECT_PROFILE = """
+SELECT user_id, full_name, bio, pfp_url, updated_at FROM profiles WHERE user_id = $1
+"""
+
+_UPSERT_PROFILE = """
+INSERT INTO profiles (user_id, full_name, bio, updated_at)
+VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+ON CONFLICT (user_id) DO UPDATE SET
+    full_name  = COALESCE(EXCLUDED.full_name, profiles.full_name),
+    bio        = COALESCE(EXCLUDED.bio,        profiles.bio),
+    updated_at = CURRENT_TIMESTAMP
+RETURNING user_id, full_name, bio, pfp_url, updated_at
+"""
+
+
 # ── Helpers ────────────────────────────────────────────────────────────────
 
 def _row_to_out(row, user_id: int, email: str) -> dict:
-    """Convert a DB row (RealDictRow or None) to a plain dict for the response."""
+    """Convert a DB row (RealDictRow / asyncpg Record or None) to a plain dict for the response."""
     if row is None:
         # No profile row yet — return empty profile with the session user_id
         return {"user_id": user_id, "full_name": None, "bio": None, "pfp_url": None, "email": email}
@@ -63,28 +83,30 @@ def _row_to_out(row, user_id: int, email: str) -> dict:
 # ── Routes ─────────────────────────────────────────────────────────────────
 
 @router.get("", response_model=ProfileOut)
-def read_profile(current_user: dict = Depends(get_current_user)):
+async def read_profile(
+    current_user: dict = Depends(get_current_user),
+    con=Depends(get_db_conn),
+):
     """Return the authenticated user's profile (may have null fields if never set)."""
     user_id = current_user["user_id"]
     email   = current_user["email"]
-    row = get_profile(user_id)
+    row = await con.fetchrow(_SELECT_PROFILE, user_id)
     return _row_to_out(row, user_id, email)
 
 
 @router.put("", response_model=ProfileOut)
-def write_profile(
+async def write_profile(
     body: ProfileUpdate,
     current_user: dict = Depends(get_current_user),
+    con=Depends(get_db_conn),
 ):
     """Create or update full_name and/or bio for the authenticated user."""
     user_id = current_user["user_id"]
     email   = current_user["email"]
 
-    row = upsert_profile(
-        user_id   = user_id,
-        full_name = body.full_name,
-        bio       = body.bio,
-    )
+    # asyncpg runs outside an explicit transaction, so this autocommits
+    row = await con.fetchrow(_UPSERT_PROFILE, user_id, body.full_name, body.bio)
+    invalidate_user(user_id)
     return _row_to_out(row, user_id, email)
 
 
@@ -105,21 +127,38 @@ async def upload_avatar(
     if file.content_type not in ALLOWED_MIME:
         raise HTTPException(status_code=400, detail="Only JPEG, PNG, WebP, or GIF images are allowed.")
 
-    # ── Read and validate size
-    contents = await file.read()
-    if len(contents) > MAX_SIZE_BYTES:
-        raise HTTPException(status_code=400, detail="Image must be under 2 MB.")
-
-    # ── Save with a unique filename
-    ext      = Path(file.filename).suffix.lower() or ".jpg"
-    filename = f"{user_id}_{uuid.uuid4().hex}{ext}"
-    dest     = AVATAR_DIR / filename
-
-    with open(dest, "wb") as f:
-        f.write(contents)
-
-
-    pfp_url = f"http://localhost:8000/static/avatars/{filename}"
-
-    row = update_profile_avatar(user_id, pfp_url)
+    # ── Stream to a temp file, checking size and hashing as we go.
+    #    The content hash becomes the filename, so identical images map to
+    #    one file on disk and a repeat upload skips the write entirely.
+    ext    = Path(file.filename).suffix.lower() or ".jpg"
+    digest = hashlib.sha256()
+    total  = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=AVATAR_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                total += len(chunk)
+                if total > MAX_SIZE_BYTES:
+                    raise HTTPException(status_code=400, detail="Image must be under 2 MB.")
+                digest.update(chunk)
+                f.write(chunk)
+
+        filename = f"{digest.hexdigest()}{ext}"
+        dest     = AVATAR_DIR / filename
+        if dest.exists():
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    pfp_url = f"{AVATAR_BASE_URL}/{filename}"
+
+    # No conn passed: a pooled connection is borrowed for the UPDATE only,
+    # not held while the upload streams in
+    row = await run_in_threadpool(update_profile_avatar, user_id, pfp_url)
+    invalidate_user(user_id)
     return _row_to_out(row, user_id, email)
\ No newline at end of file
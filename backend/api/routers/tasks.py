@@ -25,6 +25,7 @@ from core.database import (
     store_message,
     get_last_n_messages,
     get_connection,
+    release_connection,
     create_task,
     store_execution_result,
     log_system_event,
@@ -211,7 +212,7 @@ def get_history(
         rows = [dict(r) for r in cur.fetchall()]
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     # Python-level guard: skip consecutive same-role duplicates
     # (handles edge case where content differs by whitespace only)
@@ -265,7 +266,7 @@ def list_conversations(current_user: dict = Depends(get_current_user)):
         return {"conversations": [dict(r) for r in rows]}
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
 
 # ─── Delete / archive a conversation ─────────────────────────────────────────
@@ -291,4 +292,4 @@ def delete_conversation(
         return {"message": "Conversation deleted"}
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        release_connection(conn)
\ No newline at end of file
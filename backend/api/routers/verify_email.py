@@ -11,36 +11,94 @@ load_dotenv(find_dotenv())
 import os
 import secrets
 import string
-import smtplib
+import threading
 from datetime import datetime, timedelta, timezone
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
 
-SMTP_HOST     = os.getenv("SMTP_HOST", "smtp.gmail.com")
-SMTP_PORT     = int(os.getenv("SMTP_PORT", 587))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+from api.deps import get_db_conn
+from core.logger import get_logger
+from core.mailer import send_html_email
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+REDIS_URL = os.getenv("REDIS_URL")
 
 router = APIRouter(prefix="/api", tags=["verify-email"])
+logger = get_logger("verify_email")
+
+OTP_TTL_MINUTES = 10
 
-# In-memory store: email -> (otp, expires_at)
+# Shared OTP store: Redis (native TTL, visible to every uvicorn worker) when
+# REDIS_URL is set, otherwise a locked in-process dict for single-worker dev.
+_redis_client = None
+if redis is not None and REDIS_URL:
+    try:
+        _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    except Exception as e:
+        logger.warning(f"⚠️  Redis unavailable for OTP store, using in-memory: {e}")
+        _redis_client = None
+
+# In-memory fallback: email -> (otp, expires_at)
 _verification_store: Dict[str, Tuple[str, datetime]] = {}
+_verification_lock = threading.Lock()
 
-OTP_TTL_MINUTES = 10
+
+def _otp_key(email: str) -> str:
+    return f"otp:verify:{email}"
+
+
+async def _save_otp(email: str, otp: str) -> None:
+    if _redis_client is not None:
+        await _redis_client.set(_otp_key(email), otp, ex=OTP_TTL_MINUTES * 60)
+        return
+    with _verification_lock:
+        _verification_store[email] = (
+            otp,
+            datetime.now(timezone.utc) + timedelta(minutes=OTP_TTL_MINUTES),
+        )
+
+
+async def _load_otp(email: str) -> Optional[str]:
+    """Return the pending OTP for email, or None if missing/expired."""
+    if _redis_client is not None:
+        return await _redis_client.get(_otp_key(email))
+    with _verification_lock:
+        entry = _verification_store.get(email)
+        if not entry:
+            return None
+        otp, expires_at = entry
+        if datetime.now(timezone.utc) > expires_at:
+            _verification_store.pop(email, None)
+            return None
+        return otp
+
+
+async def _consume_otp(email: str) -> None:
+    if _redis_client is not None:
+        await _redis_client.delete(_otp_key(email))
+        return
+    with _verification_lock:
+        _verification_store.pop(email, None)
+
+
+async def _email_registered(conn, email: str) -> bool:
+    row = await conn.fetchrow("SELECT 1 FROM users WHERE email = $1", email)
+    return row is not None
 
 
 def _generate_otp() -> str:
     return "".join(secrets.choice(string.digits) for _ in range(6))
 
 
-def _send_verification_email(to_email: str, otp: str) -> None:
-    otp_display = " ".join(otp)
-
-    html = f"""<!DOCTYPE html>
+# Built once at import; only the code and TTL are filled in per email.
+_VERIFY_SUBJECT = "[E.V.E.] Verify your email address"
+_VERIFY_HTML_TEMPLATE = string.Template("""<!DOCTYPE html>
 <html lang="en">
 <head><meta charset="UTF-8"><meta name="viewport" content="width=device-width,initial-scale=1"></head>
 <body style="margin:0;padding:0;background:#f6f6f6;">
@@ -67,11 +125,11 @@ def _send_verification_email(to_email: str, otp: str) -> None:
       <tr><td style="padding:36px 32px;text-align:center;">
         <div style="font-size:40px;font-weight:300;letter-spacing:5px;color:#111;
                     font-family:'Courier New',monospace;margin-bottom:16px;">
-          {otp_display}
+          $otp
         </div>
         <div style="font-size:11px;color:#bbb;font-family:-apple-system,sans-serif;">
           Expires in
-          <span style="color:#FF14A5;font-weight:500;">{OTP_TTL_MINUTES} minutes</span>
+          <span style="color:#FF14A5;font-weight:500;">$ttl minutes</span>
         </div>
       </td></tr>
 
@@ -87,18 +145,20 @@ def _send_verification_email(to_email: str, otp: str) -> None:
   </td></tr>
 </table>
 </body>
-</html>"""
+</html>""")
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = "[E.V.E.] Verify your email address"
-    msg["From"]    = SMTP_USERNAME
-    msg["To"]      = to_email
-    msg.attach(MIMEText(html, "html"))
 
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as s:
-        s.ehlo(); s.starttls(); s.ehlo()
-        s.login(SMTP_USERNAME, SMTP_PASSWORD)
-        s.sendmail(SMTP_USERNAME, to_email, msg.as_string())
+def _send_verification_email(to_email: str, otp: str) -> None:
+    otp_display = " ".join(otp)
+    html = _VERIFY_HTML_TEMPLATE.substitute(otp=otp_display, ttl=OTP_TTL_MINUTES)
+    send_html_email(to_email, _VERIFY_SUBJECT, html)
+
+
+def _send_verification_email_safe(to_email: str, otp: str) -> None:
+    try:
+        _send_verification_email(to_email, otp)
+    except Exception as e:
+        logger.error(f"Verification email failed: {e}")
 
 
 # ── Schemas ────────────────────────────────────────────────────────────────────
@@ -114,30 +174,20 @@ class VerifyEmailRequest(BaseModel):
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @router.post("/send-verification")
-async def send_verification(data: SendVerificationRequest):
+async def send_verification(
+    data: SendVerificationRequest,
+    background_tasks: BackgroundTasks,
+    conn=Depends(get_db_conn),
+):
     """Step 1. Send OTP to the given email before account creation."""
-    from core.database import get_connection
-    conn = get_connection()
-    cur  = conn.cursor()
-    try:
-        cur.execute("SELECT user_id FROM users WHERE email = %s", (data.email,))
-        if cur.fetchone():
-            raise HTTPException(status_code=400, detail="Email already registered")
-    finally:
-        cur.close()
-        conn.close()
+    if await _email_registered(conn, data.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
 
     otp = _generate_otp()
-    _verification_store[data.email] = (
-        otp,
-        datetime.now(timezone.utc) + timedelta(minutes=OTP_TTL_MINUTES),
-    )
+    await _save_otp(data.email, otp)
 
-    try:
-        _send_verification_email(data.email, otp)
-    except Exception as e:
-        print(f"Verification email failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send verification email")
+    # SMTP runs after the response is sent
+    background_tasks.add_task(_send_verification_email_safe, data.email, otp)
 
     return {"message": "Verification code sent to your email."}
 
@@ -145,17 +195,12 @@ async def send_verification(data: SendVerificationRequest):
 @router.post("/verify-email")
 async def verify_email(data: VerifyEmailRequest):
     """Step 2. Validate OTP — returns verified=True so frontend can proceed with register."""
-    entry = _verification_store.get(data.email)
-    if not entry:
-        raise HTTPException(status_code=400, detail="No verification code requested for this email")
-
-    otp, expires_at = entry
-    if datetime.now(timezone.utc) > expires_at:
-        _verification_store.pop(data.email, None)
-        raise HTTPException(status_code=400, detail="Verification code has expired")
+    otp = await _load_otp(data.email)
+    if not otp:
+        raise HTTPException(status_code=400, detail="Verification code has expired or was never requested")
 
     if not secrets.compare_digest(data.otp.strip(), otp):
         raise HTTPException(status_code=400, detail="Invalid verification code")
 
-    _verification_store.pop(data.email, None)  # consume — one-time use
+    await _consume_otp(data.email)  # consume — one-time use
     return {"verified": True}
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+E.V.E. Async Database Pool — backend/core/async_db.py
+
+asyncpg pool for the pure-IO request paths (session lookup, profile
+read/write, email existence checks). These run on the event loop instead
+of tying up a threadpool worker per request. Everything else keeps using
+the psycopg2 pool in core/database.py.
+
+Lifecycle is driven by main.py's startup/shutdown events.
+"""
+import ssl
+
+from core.config import DB_CONFIG, DB_POOL_MIN_CONN, DB_POOL_MAX_CONN
+from core.database import _build_db_config
+from core.logger import get_logger
+
+logger = get_logger("async_db")
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+ACQUIRE_TIMEOUT_S = 2
+
+_pool = None
+
+
+def _ssl_context(db_config: dict):
+    """asyncpg takes an SSLContext rather than libpq's sslmode/sslrootcert"""
+    if db_config.get("sslmode") == "disable":
+        return False
+    cafile = db_config.get("sslrootcert")
+    return ssl.create_default_context(cafile=cafile) if cafile else True
+
+
+async def init_async_pool() -> None:
+    """Create and warm the asyncpg pool (call once at app startup)"""
+    global _pool
+    if asyncpg is None:
+        logger.warning("⚠️  asyncpg not installed — async DB routes unavailable")
+        return
+    if _pool is not None:
+        return
+
+    db_config = _build_db_config()
+    try:
+        _pool = await asyncpg.create_pool(
+            host=db_config.get("host"),
+            port=db_config.get("port"),
+            user=db_config.get("user"),
+            password=db_config.get("password"),
+            database=db_config.get("database"),
+            ssl=_ssl_context(db_config),
+            min_size=DB_POOL_MIN_CONN,
+            max_size=DB_POOL_MAX_CONN,
+            # Round-trip each new connection so the first requests don't pay for it
+            init=lambda c: c.execute("SELECT 1"),
+        )
+        logger.info(f"✅ asyncpg pool ready ({DB_POOL_MIN_CONN}-{DB_POOL_MAX_CONN} connections)")
+    except Exception as e:
+        logger.error(f"❌ asyncpg pool failed: {e}")
+        logger.error(f"   Config: {DB_CONFIG.get('host')}:{DB_CONFIG.get('port')}/{DB_CONFIG.get('database')}")
+        _pool = None
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_async_pool():
+    """Return the live asyncpg pool, or None if it was never started"""
+    return _pool
@@ -0,0 +1,55 @@
+"""
+E.V.E. Auth Log Writer — backend/core/auth_log.py
+
+Login/register attempts are pushed onto an in-process queue and written
+to auth_logs in batches by a background thread, so the auth endpoints
+don't pay for an extra INSERT + commit on every request.
+"""
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+from core.batch_writer import BatchWriter
+from core.database import get_connection, release_connection
+from core.logger import get_logger
+
+logger = get_logger("auth_log")
+
+BATCH_MAX_ROWS   = 500
+FLUSH_INTERVAL_S = 0.2
+
+
+def _write_batch(rows: list) -> None:
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        execute_values(
+            cur,
+            "INSERT INTO auth_logs (user_id, auth_status, ip_address, login_time) VALUES %s",
+            rows,
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"⚠️ auth_log flush error ({len(rows)} rows dropped): {e}")
+    finally:
+        cur.close()
+        release_connection(conn)
+
+
+_writer = BatchWriter(
+    "auth-log-writer",
+    _write_batch,
+    max_rows=BATCH_MAX_ROWS,
+    interval_s=FLUSH_INTERVAL_S,
+)
+
+
+def log_auth_event(user_id: int, auth_status: str, ip_address: str) -> None:
+    """Queue one auth_logs row; returns immediately."""
+    _writer.put((user_id, auth_status, ip_address, datetime.now(timezone.utc).replace(tzinfo=None)))
+
+
+def flush_auth_logs() -> None:
+    """Write whatever is still queued (also called on interpreter shutdown)."""
+    _writer.flush()
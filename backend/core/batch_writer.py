@@ -0,0 +1,91 @@
+"""
+E.V.E. Batch Writer — backend/core/batch_writer.py
+
+Write-behind queue: producers enqueue rows and return immediately; one
+daemon thread drains the queue and hands each batch to a write function
+(typically a multi-row INSERT). Used for auth_logs and system_logs.
+"""
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from core.logger import get_logger
+
+logger = get_logger("batch_writer")
+
+
+class BatchWriter:
+    """Collect rows on a queue and flush them every max_rows or interval_s"""
+
+    def __init__(
+        self,
+        name: str,
+        write_batch: Callable[[List[tuple]], None],
+        max_rows: int = 500,
+        interval_s: float = 0.2,
+        maxsize: int = 0,
+    ):
+        self.name = name
+        self._write_batch = write_batch
+        self.max_rows = max_rows
+        self.interval_s = interval_s
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def put(self, row: tuple) -> bool:
+        """Queue one row; returns False (row dropped) if the queue is full."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self) -> None:
+        """Write whatever is still queued (also runs on interpreter shutdown)."""
+        while True:
+            rows = self._drain(block_first=False)
+            if not rows:
+                return
+            self._write_batch(rows)
+
+    def _drain(self, block_first: bool) -> list:
+        """Collect up to max_rows rows, waiting at most interval_s."""
+        rows = []
+        deadline = time.monotonic() + self.interval_s
+        while len(rows) < self.max_rows:
+            timeout = deadline - time.monotonic()
+            try:
+                if block_first and not rows:
+                    rows.append(self._queue.get())   # sleep until there's work
+                    deadline = time.monotonic() + self.interval_s
+                elif timeout > 0:
+                    rows.append(self._queue.get(timeout=timeout))
+                else:
+                    rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self) -> None:
+        while True:
+            rows = self._drain(block_first=True)
+            if not rows:
+                continue
+            try:
+                self._write_batch(rows)
+            except Exception as e:
+                # e.g. pool unavailable — drop the batch, keep the thread alive
+                logger.error(f"⚠️ {self.name}: {len(rows)} rows dropped: {e}")
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
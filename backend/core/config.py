@@ -19,6 +19,10 @@ SECRET_KEY = os.getenv("SECRET_KEY", "ORCHESTRATION2026")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# bcrypt work factor — calibrate so one hash takes ~100ms on the prod CPU.
+# Existing hashes at a different cost are re-hashed on the next good login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 11))
+
 
 # =============================================================================
 # MASTER CONTROLLER SETTINGS
@@ -41,11 +45,20 @@ HEALTH_CHECK_INTERVAL = 5
 AI_PROVIDER = "groq"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 MASTER_AI_MODEL = "groq/compound"  # Best for intelligent routing
+# Continuation/new-request classification is a yes/no call - a small fast model is plenty
+CONTEXT_CLASSIFIER_MODEL = os.getenv("CONTEXT_CLASSIFIER_MODEL", "llama-3.1-8b-instant")
 
 AI_MAX_TOKENS = 1000
 AI_TEMPERATURE = 0.7
 AI_TIMEOUT = 30
 
+# Validation / context-detection answers cached across restarts ("" = memory only)
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm_cache.db")
+)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10_000))
+
 # =============================================================================
 # DATABASE CONFIGURATION - PostgreSQL on Aiven
 # =============================================================================
@@ -66,6 +79,24 @@ DB_CONFIG = {
     "sslrootcert": _ssl_cert_path
 }
 
+# Connection pool bounds (per process)
+DB_POOL_MIN_CONN = int(os.getenv("DB_POOL_MIN_CONN", 5))
+DB_POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX_CONN", 20))
+
+# system_logs / performance_metrics are append-only and crash-tolerant, so
+# they skip WAL. Set to false if those rows must survive a server crash.
+UNLOGGED_LOG_TABLES = os.getenv("UNLOGGED_LOG_TABLES", "true").lower() in ("1", "true", "yes")
+
+# =============================================================================
+# STATIC ASSETS (avatars)
+# =============================================================================
+
+# Avatars are content-addressed ({sha256}{ext}), so any static server or CDN
+# can cache them forever. Point AVATAR_BASE_URL at that origin in production
+# and set SERVE_STATIC_FILES=false to keep avatar GETs off uvicorn.
+AVATAR_BASE_URL = os.getenv("AVATAR_BASE_URL", "http://localhost:8000/static/avatars").rstrip("/")
+SERVE_STATIC_FILES = os.getenv("SERVE_STATIC_FILES", "true").lower() in ("1", "true", "yes")
+
 # =============================================================================
 # CONTEXT ENGINE SETTINGS
 # =============================================================================
@@ -1,46 +1,250 @@
 """
 E.V.E. Master Controller - DATABASE SCHEMA (Production-Ready)
-Auto-creates database and tables on startup if they don't exist
+Auto-creates database and tables on first connection if they don't exist
 Includes: Users, Profiles, AI_Agents, Tasks, Assignments, Results, Context, Performance, Logs
 """
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, execute_batch, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import copy
+import functools
 import json
 import os
-from core.config import DB_CONFIG
+import threading
+import time
+from contextlib import contextmanager
+from core.batch_writer import BatchWriter
+from core.config import DB_CONFIG, DB_POOL_MIN_CONN, DB_POOL_MAX_CONN, UNLOGGED_LOG_TABLES
+from core.logger import get_logger
+
+logger = get_logger("database")
 
 # =============================================================================
 # CONNECTION MANAGEMENT
 # =============================================================================
 
+# Process-wide pool, created on first use so a DB outage at import time
+# doesn't take the whole module down.
+_POOL: Optional[ThreadedConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+# Rows per multi-row INSERT in the *_bulk helpers
+BULK_PAGE_SIZE = 500
+
+# Rows per FETCH for server-side cursors on large reads
+STREAM_ITERSIZE = 500
+
+
+# Server-side prepared statements for the hot queries. Each pooled
+# connection PREPAREs these once; callers run them with
+#   cur.execute("EXECUTE <name> (%s)", (arg,))
+PREPARED_STATEMENTS = {
+    "user_by_id":       "SELECT user_id, email, role FROM users WHERE user_id = $1",
+    "login_by_email":   "SELECT user_id, password_hash, role FROM users WHERE email = $1",
+    "user_id_by_email": "SELECT user_id FROM users WHERE email = $1",
+    # Master/worker write path — fired many times a second
+    "hb_upd": """UPDATE ai_agents
+                 SET last_heartbeat = CURRENT_TIMESTAMP, status = $1,
+                     cpu_usage = $2, memory_usage = $3, temperature = $4
+                 WHERE agent_name = $5""",
+    # Upserts the conversation and appends the message in one statement
+    "msg_insert": """WITH c AS (
+                         INSERT INTO conversations (conversation_id, user_id, started_at, last_updated, is_active)
+                         VALUES ($1, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, TRUE)
+                         ON CONFLICT (conversation_id)
+                         DO UPDATE SET last_updated = CURRENT_TIMESTAMP, is_active = TRUE
+                         RETURNING conversation_id
+                     )
+                     INSERT INTO messages (conversation_id, role, content, timestamp)
+                     SELECT conversation_id, $2, $3, CURRENT_TIMESTAMP FROM c
+                     RETURNING message_id""",
+    "ctx_insert": """INSERT INTO context_data (task_id, context_data, context_type, simhash)
+                     VALUES ($1, $2, $3, $4)""",
+    "queue_upsert": """INSERT INTO task_queue (task_id, priority) VALUES ($1, $2)
+                       ON CONFLICT (task_id) DO UPDATE SET priority = EXCLUDED.priority""",
+}
+
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers whether PREPARED_STATEMENTS were issued on it"""
+    prepared = False
+
+
+def _prepare(conn) -> None:
+    try:
+        with conn.cursor() as cur:
+            # PREPARE is session-level and survives ROLLBACK, so a failed
+            # earlier attempt can leave some names behind - start clean
+            cur.execute("DEALLOCATE ALL")
+            for name, sql in PREPARED_STATEMENTS.items():
+                cur.execute(f"PREPARE {name} AS {sql}")
+        conn.commit()
+        conn.prepared = True
+    except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn):
+        # Fresh database (init_database() hasn't created users yet) or one
+        # from before a column was added (e.g. context_data.simhash) that
+        # init_database() will migrate. Leave the flag unset so the next
+        # checkout retries.
+        conn.rollback()
+
+
+def _build_db_config() -> Dict:
+    """Resolve DB_CONFIG into psycopg2 connect kwargs (SSL cert path etc.)"""
+    db_config = DB_CONFIG.copy()
+
+    if 'sslrootcert' in db_config and db_config['sslrootcert']:
+        if db_config.get('sslmode') != 'disable':
+            if not os.path.isabs(db_config['sslrootcert']):
+                db_config['sslrootcert'] = os.path.join(
+                    os.path.dirname(__file__),
+                    db_config['sslrootcert']
+                )
+
+    if db_config.get('sslmode') == 'disable':
+        db_config.pop('sslrootcert', None)
+
+    return db_config
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Create the connection pool once and warm its initial connections"""
+    global _POOL
+    if _POOL is not None:
+        return _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            db_config = _build_db_config()
+            try:
+                pool = ThreadedConnectionPool(
+                    DB_POOL_MIN_CONN,
+                    DB_POOL_MAX_CONN,
+                    connection_factory=_PooledConnection,
+                    cursor_factory=RealDictCursor,
+                    **db_config
+                )
+            except Exception as e:
+                logger.error(f"❌ Database connection failed: {e}")
+                logger.error(f"   Config: {db_config.get('host')}:{db_config.get('port')}/{db_config.get('database')}")
+                logger.error(f"   SSL Mode: {db_config.get('sslmode', 'default')}")
+                raise
+
+            # Warm the initial connections so the first requests don't pay for it
+            warm = [pool.getconn() for _ in range(DB_POOL_MIN_CONN)]
+            for conn in warm:
+                try:
+                    _prepare(conn)
+                finally:
+                    pool.putconn(conn)
+
+            _POOL = pool
+
+    return _POOL
+
+
+# Schema init runs lazily on the first connection checkout rather than at
+# import, so tools that merely import this module never touch the DB.
+_DB_INIT_LOCK = threading.RLock()
+_db_initialized = False
+_db_init_running = False
+
+
+def _ensure_initialized() -> None:
+    global _db_initialized, _db_init_running
+    if _db_initialized:
+        return
+    with _DB_INIT_LOCK:
+        # _db_init_running: init_database() itself checking out a connection
+        if _db_initialized or _db_init_running:
+            return
+        _db_init_running = True
+        try:
+            init_database()
+            _db_initialized = True
+        except Exception as e:
+            logger.warning(f"⚠️  Warning: Could not initialize database: {e}")
+            logger.warning("   Will retry on the next connection attempt")
+        finally:
+            _db_init_running = False
+
+
 def get_connection():
-    """Get database connection with improved SSL handling"""
+    """Get a pooled database connection. Always hand it back with release_connection()"""
+    _ensure_initialized()
+    pool = _get_pool()
+    conn = pool.getconn()
+    if not conn.prepared:
+        try:
+            _prepare(conn)
+        except Exception:
+            pool.putconn(conn, close=True)
+            raise
+    return conn
+
+
+def release_connection(conn):
+    """Return a connection to the pool (rolls back any open transaction)"""
+    if conn is None:
+        return
+    if _POOL is None:
+        conn.close()
+        return
+    _POOL.putconn(conn)
+
+
+@contextmanager
+def get_conn(conn=None, readonly: bool = False):
+    """
+    with get_conn() as conn: ...   — borrow a pooled connection for the block.
+    Pass an existing conn to reuse it instead (it is then left open).
+    readonly=True runs the block in autocommit: each SELECT is its own
+    statement, with no BEGIN before it and no ROLLBACK when it goes back
+    to the pool. Only for blocks that never write.
+    """
+    if conn is not None:
+        yield conn
+        return
+    conn = get_connection()
+    if readonly:
+        conn.autocommit = True
     try:
-        db_config = DB_CONFIG.copy()
-
-        if 'sslrootcert' in db_config and db_config['sslrootcert']:
-            if db_config.get('sslmode') != 'disable':
-                if not os.path.isabs(db_config['sslrootcert']):
-                    db_config['sslrootcert'] = os.path.join(
-                        os.path.dirname(__file__),
-                        db_config['sslrootcert']
-                    )
-
-        if db_config.get('sslmode') == 'disable':
-            db_config.pop('sslrootcert', None)
-
-        conn = psycopg2.connect(
-            cursor_factory=RealDictCursor,
-            **db_config
-        )
-        return conn
-    except Exception as e:
-        print(f"❌ Database connection failed: {e}")
-        print(f"   Config: {db_config.get('host')}:{db_config.get('port')}/{db_config.get('database')}")
-        print(f"   SSL Mode: {db_config.get('sslmode', 'default')}")
-        raise
+        yield conn
+    finally:
+        if readonly and not conn.closed:
+            conn.autocommit = False
+        release_connection(conn)
+
+
+def _ttl_cached(ttl: float):
+    """
+    Cache a read-only query's result per positional args for ttl seconds.
+    For polled dashboards/stats where a couple of seconds of staleness is fine.
+    Callers get a deep copy, so mutating a result can't poison the cache.
+    """
+    def decorator(func):
+        cache: Dict[tuple, tuple] = {}   # args -> (expires_at, value)
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(args)
+            if entry is not None and entry[0] > now:
+                return copy.deepcopy(entry[1])
+            value = func(*args)
+            with lock:
+                cache[args] = (now + ttl, value)
+            return copy.deepcopy(value)
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
 
 # =============================================================================
 # DATABASE INITIALIZATION - PRODUCTION READY
@@ -51,252 +255,278 @@ def init_database():
     Initialize database schema - ensures all tables exist on startup.
     Fully idempotent - safe to run multiple times.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    try:
-        print("\n" + "="*70)
-        print("🔄 INITIALIZING DATABASE SCHEMA")
-        print("="*70)
-        print("\n📊 Ensuring all tables exist...")
-
-        # 1. Users (Authentication only — no profile columns here)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id       SERIAL PRIMARY KEY,
-            email         VARCHAR(100) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            role          VARCHAR(10)  DEFAULT 'user',
-            status        VARCHAR(10)  DEFAULT 'active',
-            is_verified   BOOLEAN      DEFAULT FALSE,
-            created_at    TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ users")
-
-        # 2. Profiles (Extended user info — separate table, post-login only)
-        #    user_id is both PK and FK → one profile per user.
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS profiles (
-            user_id    INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
-            full_name  VARCHAR(100),
-            bio        TEXT,
-            pfp_url    TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ profiles")
+    with get_conn() as conn, conn.cursor() as cursor:
+        try:
+            logger.info("="*70)
+            logger.info("🔄 INITIALIZING DATABASE SCHEMA")
+            logger.info("="*70)
+            logger.info("📊 Ensuring all tables exist...")
+
+            # 1. Users (Authentication only — no profile columns here)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id       SERIAL PRIMARY KEY,
+                email         VARCHAR(100) UNIQUE NOT NULL,
+                password_hash VARCHAR(255) NOT NULL,
+                role          VARCHAR(10)  DEFAULT 'user',
+                status        VARCHAR(10)  DEFAULT 'active',
+                is_verified   BOOLEAN      DEFAULT FALSE,
+                created_at    TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ users")
 
-        # 3. Auth_Logs (Security)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS auth_logs (
-            log_id      SERIAL PRIMARY KEY,
-            user_id     INTEGER REFERENCES users(user_id),
-            login_time  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            auth_status VARCHAR(10) NOT NULL,
-            ip_address  VARCHAR(45)
-        )
-        """)
-        print("   ✓ auth_logs")
+            # 2. Profiles (Extended user info — separate table, post-login only)
+            #    user_id is both PK and FK → one profile per user.
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                user_id    INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+                full_name  VARCHAR(100),
+                bio        TEXT,
+                pfp_url    TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ profiles")
 
-        # 4. AI_Agents (Registry)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ai_agents (
-            agent_id           SERIAL PRIMARY KEY,
-            agent_name         VARCHAR(50) NOT NULL UNIQUE,
-            capability         VARCHAR(100) NOT NULL,
-            status             VARCHAR(10) DEFAULT 'idle',
-            last_heartbeat     TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            host               VARCHAR(100),
-            port               INTEGER,
-            cpu_usage          FLOAT DEFAULT 0.0,
-            memory_usage       FLOAT DEFAULT 0.0,
-            temperature        FLOAT DEFAULT 0.0,
-            total_tasks        INTEGER DEFAULT 0,
-            successful_tasks   INTEGER DEFAULT 0,
-            failed_tasks       INTEGER DEFAULT 0,
-            avg_execution_time FLOAT DEFAULT 0.0,
-            created_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ ai_agents")
+            # 3. Auth_Logs (Security)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS auth_logs (
+                log_id      SERIAL PRIMARY KEY,
+                user_id     INTEGER REFERENCES users(user_id),
+                login_time  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                auth_status VARCHAR(10) NOT NULL,
+                ip_address  VARCHAR(45)
+            )
+            """)
+            logger.info("   ✓ auth_logs")
 
-        # 5. User_Tasks (Requests)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_tasks (
-            task_id     SERIAL PRIMARY KEY,
-            user_id     INTEGER REFERENCES users(user_id) DEFAULT 1,
-            task_desc   TEXT NOT NULL,
-            task_status VARCHAR(10) DEFAULT 'pending',
-            task_type   VARCHAR(50),
-            priority    INTEGER DEFAULT 1,
-            retry_count INTEGER DEFAULT 0,
-            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ user_tasks")
+            # 4. AI_Agents (Registry)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ai_agents (
+                agent_id           SERIAL PRIMARY KEY,
+                agent_name         VARCHAR(50) NOT NULL UNIQUE,
+                capability         VARCHAR(100) NOT NULL,
+                status             VARCHAR(10) DEFAULT 'idle',
+                last_heartbeat     TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                host               VARCHAR(100),
+                port               INTEGER,
+                cpu_usage          FLOAT DEFAULT 0.0,
+                memory_usage       FLOAT DEFAULT 0.0,
+                temperature        FLOAT DEFAULT 0.0,
+                total_tasks        INTEGER DEFAULT 0,
+                successful_tasks   INTEGER DEFAULT 0,
+                failed_tasks       INTEGER DEFAULT 0,
+                avg_execution_time FLOAT DEFAULT 0.0,
+                created_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ ai_agents")
 
-        # 6. Task_Assignments (Controller)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS task_assignments (
-            task_id          INTEGER PRIMARY KEY REFERENCES user_tasks(task_id) ON DELETE CASCADE,
-            agent_id         INTEGER REFERENCES ai_agents(agent_id),
-            assigned_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            assignment_order INTEGER DEFAULT 1
-        )
-        """)
-        print("   ✓ task_assignments")
+            # 5. User_Tasks (Requests)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_tasks (
+                task_id     SERIAL PRIMARY KEY,
+                user_id     INTEGER REFERENCES users(user_id) DEFAULT 1,
+                task_desc   TEXT NOT NULL,
+                task_status VARCHAR(10) DEFAULT 'pending',
+                task_type   VARCHAR(50),
+                priority    INTEGER DEFAULT 1,
+                retry_count INTEGER DEFAULT 0,
+                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ user_tasks")
 
-        # 7. Execution_Results (Output)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS execution_results (
-            result_id      SERIAL PRIMARY KEY,
-            task_id        INTEGER REFERENCES user_tasks(task_id) ON DELETE CASCADE,
-            agent_id       INTEGER REFERENCES ai_agents(agent_id),
-            output_data    TEXT NOT NULL,
-            success        BOOLEAN DEFAULT TRUE,
-            error_message  TEXT,
-            execution_time FLOAT,
-            completed_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ execution_results")
+            # 6. Task_Assignments (Controller)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_assignments (
+                task_id          INTEGER PRIMARY KEY REFERENCES user_tasks(task_id) ON DELETE CASCADE,
+                agent_id         INTEGER REFERENCES ai_agents(agent_id),
+                assigned_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                assignment_order INTEGER DEFAULT 1,
+                completed_at     TIMESTAMP
+            )
+            """)
+            cursor.execute("ALTER TABLE task_assignments ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP")
+            # Rows from before completed_at existed: close the ones whose task finished
+            cursor.execute("""
+            UPDATE task_assignments SET completed_at = assigned_at
+            WHERE completed_at IS NULL
+              AND task_id IN (SELECT task_id FROM user_tasks WHERE task_status IN ('completed', 'failed'))
+            """)
+            logger.info("   ✓ task_assignments")
 
-        # 8. Context_Data (Content DB)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS context_data (
-            context_id   SERIAL PRIMARY KEY,
-            task_id      INTEGER REFERENCES user_tasks(task_id) ON DELETE CASCADE,
-            context_data TEXT NOT NULL,
-            context_type VARCHAR(50),
-            updated_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ context_data")
+            # 7. Execution_Results (Output)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS execution_results (
+                result_id      SERIAL PRIMARY KEY,
+                task_id        INTEGER REFERENCES user_tasks(task_id) ON DELETE CASCADE,
+                agent_id       INTEGER REFERENCES ai_agents(agent_id),
+                output_data    TEXT NOT NULL,
+                success        BOOLEAN DEFAULT TRUE,
+                error_message  TEXT,
+                execution_time FLOAT,
+                completed_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ execution_results")
 
-        # 9. Performance_Metrics
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS performance_metrics (
-            task_id             INTEGER PRIMARY KEY REFERENCES user_tasks(task_id),
-            agent_id            INTEGER REFERENCES ai_agents(agent_id),
-            exec_time_ms        INTEGER NOT NULL,
-            success_rate        FLOAT,
-            cpu_at_execution    FLOAT,
-            memory_at_execution FLOAT,
-            recorded_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ performance_metrics")
+            # 8. Context_Data (Content DB)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS context_data (
+                context_id   SERIAL PRIMARY KEY,
+                task_id      INTEGER REFERENCES user_tasks(task_id) ON DELETE CASCADE,
+                context_data TEXT NOT NULL,
+                context_type VARCHAR(50),
+                simhash      BIGINT,
+                updated_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            cursor.execute("ALTER TABLE context_data ADD COLUMN IF NOT EXISTS simhash BIGINT")
+            logger.info("   ✓ context_data")
 
-        # 10. System_Logs — standalone, NOT linked to auth_logs.
-        # Auto-repair: drop and recreate if old broken FK schema detected.
-        cursor.execute("""
-        SELECT column_default
-        FROM information_schema.columns
-        WHERE table_name = 'system_logs' AND column_name = 'log_id'
-        """)
-        row = cursor.fetchone()
-        if row is not None and (row['column_default'] is None or 'nextval' not in str(row['column_default'])):
-            print("   ⚠️  system_logs has broken FK schema — dropping and recreating...")
-            cursor.execute("DROP TABLE IF EXISTS system_logs CASCADE")
+            # 9. Performance_Metrics
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS performance_metrics (
+                task_id             INTEGER PRIMARY KEY REFERENCES user_tasks(task_id),
+                agent_id            INTEGER REFERENCES ai_agents(agent_id),
+                exec_time_ms        INTEGER NOT NULL,
+                success_rate        FLOAT,
+                cpu_at_execution    FLOAT,
+                memory_at_execution FLOAT,
+                recorded_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ performance_metrics")
 
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS system_logs (
-            log_id     SERIAL PRIMARY KEY,
-            log_type   VARCHAR(10) NOT NULL,
-            message    TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ system_logs")
+            # 10. System_Logs — standalone, NOT linked to auth_logs.
+            # Auto-repair: drop and recreate if old broken FK schema detected.
+            cursor.execute("""
+            SELECT column_default
+            FROM information_schema.columns
+            WHERE table_name = 'system_logs' AND column_name = 'log_id'
+            """)
+            row = cursor.fetchone()
+            if row is not None and (row['column_default'] is None or 'nextval' not in str(row['column_default'])):
+                logger.warning("   ⚠️  system_logs has broken FK schema — dropping and recreating...")
+                cursor.execute("DROP TABLE IF EXISTS system_logs CASCADE")
 
-        # 11. Task_Queue
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS task_queue (
-            queue_id  SERIAL PRIMARY KEY,
-            task_id   INTEGER REFERENCES user_tasks(task_id) UNIQUE,
-            priority  INTEGER DEFAULT 1,
-            queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            attempts  INTEGER DEFAULT 0
-        )
-        """)
-        print("   ✓ task_queue")
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS system_logs (
+                log_id     SERIAL PRIMARY KEY,
+                log_type   VARCHAR(10) NOT NULL,
+                message    TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ system_logs")
 
-        # 12. Conversations
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS conversations (
-            conversation_id VARCHAR(100) PRIMARY KEY,
-            user_id         INTEGER REFERENCES users(user_id),
-            started_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_updated    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active       BOOLEAN DEFAULT TRUE
-        )
-        """)
-        print("   ✓ conversations")
+            # 11. Task_Queue
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS task_queue (
+                queue_id  SERIAL PRIMARY KEY,
+                task_id   INTEGER REFERENCES user_tasks(task_id) UNIQUE,
+                priority  INTEGER DEFAULT 1,
+                queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                attempts  INTEGER DEFAULT 0
+            )
+            """)
+            logger.info("   ✓ task_queue")
 
-        # 13. Messages
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id      SERIAL PRIMARY KEY,
-            conversation_id VARCHAR(100) REFERENCES conversations(conversation_id),
-            role            VARCHAR(20) NOT NULL,
-            content         TEXT NOT NULL,
-            timestamp       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        print("   ✓ messages")
+            # 12. Conversations
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                conversation_id VARCHAR(100) PRIMARY KEY,
+                user_id         INTEGER REFERENCES users(user_id),
+                started_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_updated    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_active       BOOLEAN DEFAULT TRUE
+            )
+            """)
+            logger.info("   ✓ conversations")
 
-        # Register Master Controller as the default agent
-        cursor.execute("""
-        INSERT INTO ai_agents
-        (agent_name, capability, status, host, port, last_heartbeat)
-        VALUES ('Master-Controller', 'general', 'active', 'localhost', 8000, CURRENT_TIMESTAMP)
-        ON CONFLICT (agent_name) DO NOTHING
-        """)
-        print("   ✓ Master Controller registered")
+            # 13. Messages
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                message_id      SERIAL PRIMARY KEY,
+                conversation_id VARCHAR(100) REFERENCES conversations(conversation_id),
+                role            VARCHAR(20) NOT NULL,
+                content         TEXT NOT NULL,
+                timestamp       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            logger.info("   ✓ messages")
+
+            # 14. Lookup indexes for the hot auth / dispatch / history queries
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_auth_logs_user_time ON auth_logs (user_id, login_time DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conv_time ON messages (conversation_id, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_queue_prio ON task_queue (priority DESC, queued_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_agents_status ON ai_agents (status) WHERE status = 'idle'")
+            # Live-agent scan for get_available_agents (failed agents never qualify)
+            cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_agents_hot
+            ON ai_agents (last_heartbeat DESC, status, cpu_usage, memory_usage)
+            WHERE status <> 'failed'
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_queued ON user_tasks (task_id) WHERE task_status = 'queued'")
+            # An agent is busy while it has an open assignment (see _AGENT_BUSY)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_assign_open ON task_assignments (agent_id) WHERE completed_at IS NULL")
+            logger.info("   ✓ indexes")
+
+            # 15. Log-like tables skip WAL: losing the last few rows on a crash is fine
+            if UNLOGGED_LOG_TABLES:
+                cursor.execute("""
+                SELECT relname FROM pg_class
+                WHERE relname IN ('system_logs', 'performance_metrics')
+                  AND relkind = 'r' AND relpersistence = 'p'
+                """)
+                for row in cursor.fetchall():
+                    cursor.execute(f"ALTER TABLE {row['relname']} SET UNLOGGED")
+                    logger.info(f"   ✓ {row['relname']} set UNLOGGED")
+
+            # Register Master Controller as the default agent
+            cursor.execute("""
+            INSERT INTO ai_agents
+            (agent_name, capability, status, host, port, last_heartbeat)
+            VALUES ('Master-Controller', 'general', 'active', 'localhost', 8000, CURRENT_TIMESTAMP)
+            ON CONFLICT (agent_name) DO NOTHING
+            """)
+            logger.info("   ✓ Master Controller registered")
 
-        conn.commit()
+            conn.commit()
 
-        print("\n✅ Database schema ready!")
-        print("="*70 + "\n")
+            logger.info("✅ Database schema ready!")
+            logger.info("="*70)
 
-    except Exception as e:
-        conn.rollback()
-        print(f"\n❌ Database initialization failed: {e}")
-        raise
-    finally:
-        cursor.close()
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Database initialization failed: {e}")
+            raise
 
 # =============================================================================
 # PROFILE MANAGEMENT
 # =============================================================================
 
-def get_profile(user_id: int) -> Optional[Dict]:
+def get_profile(user_id: int, conn=None) -> Optional[Dict]:
     """Get profile for a user. Returns None if no profile row yet."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn(conn) as conn, conn.cursor() as cursor:
         cursor.execute(
             "SELECT user_id, full_name, bio, pfp_url, updated_at FROM profiles WHERE user_id = %s",
             (user_id,)
         )
         return cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
 
 
-def upsert_profile(user_id: int, full_name: str = None, bio: str = None) -> Dict:
+def upsert_profile(user_id: int, full_name: str = None, bio: str = None, conn=None) -> Dict:
     """
     Create or update a user's profile row (full_name, bio).
     pfp_url is handled separately via update_profile_avatar.
     Returns the updated profile row.
+    Pass conn to reuse the request's connection instead of taking one from the pool.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn(conn) as conn, conn.cursor() as cursor:
         cursor.execute("""
         INSERT INTO profiles (user_id, full_name, bio, updated_at)
         VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
@@ -309,20 +539,16 @@ def upsert_profile(user_id: int, full_name: str = None, bio: str = None) -> Dict
         result = cursor.fetchone()
         conn.commit()
         return result
-    finally:
-        cursor.close()
-        conn.close()
 
 
-def update_profile_avatar(user_id: int, pfp_url: str) -> Dict:
+def update_profile_avatar(user_id: int, pfp_url: str, conn=None) -> Dict:
     """
     Set / replace the avatar URL for a user's profile.
     Creates the profile row if it doesn't exist yet.
     Returns the updated profile row.
+    Pass conn to reuse the request's connection instead of taking one from the pool.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn(conn) as conn, conn.cursor() as cursor:
         cursor.execute("""
         INSERT INTO profiles (user_id, pfp_url, updated_at)
         VALUES (%s, %s, CURRENT_TIMESTAMP)
@@ -334,9 +560,6 @@ def update_profile_avatar(user_id: int, pfp_url: str) -> Dict:
         result = cursor.fetchone()
         conn.commit()
         return result
-    finally:
-        cursor.close()
-        conn.close()
 
 # =============================================================================
 # AI AGENT MANAGEMENT
@@ -350,9 +573,7 @@ def register_agent(
     hardware_stats: Dict = None
 ) -> int:
     """Register or update AI agent in registry"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn() as conn, conn.cursor() as cursor:
         hw = hardware_stats or {}
         cursor.execute("""
         INSERT INTO ai_agents
@@ -375,26 +596,13 @@ def register_agent(
         result = cursor.fetchone()
         conn.commit()
         return result['agent_id']
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def update_agent_heartbeat(agent_name: str, status: str = 'idle', hardware_stats: Dict = None):
     """Update agent heartbeat and hardware stats"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn() as conn, conn.cursor() as cursor:
         hw = hardware_stats or {}
-        cursor.execute("""
-        UPDATE ai_agents
-        SET last_heartbeat = CURRENT_TIMESTAMP,
-            status = %s,
-            cpu_usage = %s,
-            memory_usage = %s,
-            temperature = %s
-        WHERE agent_name = %s
-        """, (
+        cursor.execute("EXECUTE hb_upd (%s, %s, %s, %s, %s)", (
             status,
             hw.get('cpu', 0.0),
             hw.get('memory', 0.0),
@@ -402,46 +610,108 @@ def update_agent_heartbeat(agent_name: str, status: str = 'idle', hardware_stats
             agent_name
         ))
         conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+
+
+# Busy-ness is derived from open task_assignments rows instead of being
+# written to ai_agents.status on every assign/complete. An assignment left
+# open longer than a worker call can take (120s timeout) is treated as
+# abandoned, so a crashed request can't pin its agent as busy.
+_AGENT_BUSY = """
+    EXISTS (SELECT 1 FROM task_assignments ta
+            WHERE ta.agent_id = a.agent_id AND ta.completed_at IS NULL
+              AND ta.assigned_at > NOW() - INTERVAL '5 minutes')
+"""
+
+# idle first, then busy, then anything else (e.g. 'active' for the master row)
+_AGENT_STATUS_RANK = {'idle': 1, 'busy': 2}
+
+
+def _agent_sort_key(agent: Dict):
+    return (
+        agent['is_busy'],
+        _AGENT_STATUS_RANK.get(agent['status'], 3),
+        agent['cpu_usage'] or 0.0,
+        agent['memory_usage'] or 0.0,
+    )
+
+
+# Built once so every call ships byte-identical SQL
+_SQL_AVAIL_ANY = f"""
+SELECT a.*, {_AGENT_BUSY} AS is_busy FROM ai_agents a
+WHERE last_heartbeat > NOW() - INTERVAL '30 seconds'
+  AND status <> 'failed'
+"""
+_SQL_AVAIL_TYPED = _SQL_AVAIL_ANY + "  AND (capability LIKE %s OR capability = 'general')\n"
+
+
+@functools.lru_cache(maxsize=32)
+def _capability_pattern(task_type: str) -> str:
+    return f'%{task_type}%'
 
 
 def get_available_agents(task_type: str = None) -> List[Dict]:
-    """Get available agents, optionally filtered by task type"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    """
+    Get available agents, optionally filtered by task type.
+    The WHERE clause matches the partial idx_agents_hot index; the handful of
+    live rows are ranked in Python instead of an ORDER BY CASE sort.
+    Each row carries 'is_busy' (agent has an open task assignment).
+    """
+    with get_conn(readonly=True) as conn, conn.cursor() as cursor:
         if task_type and task_type not in ['general', 'image_generation']:
-            cursor.execute("""
-            SELECT * FROM ai_agents
-            WHERE last_heartbeat > NOW() - INTERVAL '30 seconds'
-              AND (capability LIKE %s OR capability = 'general')
-              AND status != 'failed'
-            ORDER BY
-                CASE status WHEN 'idle' THEN 1 WHEN 'busy' THEN 2 ELSE 3 END,
-                cpu_usage ASC, memory_usage ASC
-            """, (f'%{task_type}%',))
+            cursor.execute(_SQL_AVAIL_TYPED, (_capability_pattern(task_type),))
         else:
-            cursor.execute("""
-            SELECT * FROM ai_agents
-            WHERE last_heartbeat > NOW() - INTERVAL '30 seconds'
-              AND status != 'failed'
-            ORDER BY
-                CASE status WHEN 'idle' THEN 1 WHEN 'busy' THEN 2 ELSE 3 END,
-                cpu_usage ASC, memory_usage ASC
-            """)
-        return cursor.fetchall()
-    finally:
-        cursor.close()
-        conn.close()
+            cursor.execute(_SQL_AVAIL_ANY)
+        agents = cursor.fetchall()
+    agents.sort(key=_agent_sort_key)
+    return agents
 
 
+def get_best_agent(
+    task_type: str = None,
+    cpu_threshold: float = 80.0,
+    memory_threshold: float = 90.0
+) -> Optional[Dict]:
+    """
+    Pick the routing target in SQL: live agents for task_type, hardware-healthy
+    ones first (all of them if none are healthy), then by performance score:
+      success_rate * 0.5 + speed * 0.3 + experience * 0.2
+    Returns one ai_agents row plus 'score' / 'success_rate' / 'is_busy', or None.
+    """
+    capability_filter = ""
+    params = {"cpu": cpu_threshold, "mem": memory_threshold}
+    if task_type and task_type not in ['general', 'image_generation']:
+        capability_filter = "AND (capability LIKE %(capability)s OR capability = 'general')"
+        params["capability"] = _capability_pattern(task_type)
+
+    with get_conn(readonly=True) as conn, conn.cursor() as cursor:
+        cursor.execute(f"""
+        SELECT a.*,
+               {_AGENT_BUSY} AS is_busy,
+               s.rate * 100 AS success_rate,
+               (s.rate * 0.5
+                + 1.0 / (1.0 + COALESCE(a.avg_execution_time, 1.0) / 10.0) * 0.3
+                + LEAST(a.successful_tasks / 100.0, 1.0) * 0.2) AS score
+        FROM ai_agents a
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(a.successful_tasks::float / NULLIF(a.total_tasks, 0), 0) AS rate
+        ) s
+        WHERE a.last_heartbeat > NOW() - INTERVAL '30 seconds'
+          AND a.status <> 'failed'
+          {capability_filter}
+        ORDER BY COALESCE(a.cpu_usage < %(cpu)s AND a.memory_usage < %(mem)s, FALSE) DESC,
+                 score DESC,
+                 is_busy,
+                 CASE status WHEN 'idle' THEN 1 WHEN 'busy' THEN 2 ELSE 3 END,
+                 cpu_usage, memory_usage
+        LIMIT 1
+        """, params)
+        return cursor.fetchone()
+
+
+@_ttl_cached(ttl=2.0)
 def get_agent_performance(agent_id: int) -> Dict:
     """Get agent performance metrics"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn(readonly=True) as conn, conn.cursor() as cursor:
         cursor.execute("""
         SELECT
             agent_name, capability, total_tasks, successful_tasks, failed_tasks,
@@ -453,9 +723,6 @@ def get_agent_performance(agent_id: int) -> Dict:
         FROM ai_agents WHERE agent_id = %s
         """, (agent_id,))
         return cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
 
 # =============================================================================
 # TASK MANAGEMENT
@@ -463,9 +730,7 @@ def get_agent_performance(agent_id: int) -> Dict:
 
 def create_task(user_id: int, task_desc: str, task_type: str = 'general', priority: int = 1) -> int:
     """Create new user task"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn() as conn, conn.cursor() as cursor:
         cursor.execute("""
         INSERT INTO user_tasks (user_id, task_desc, task_type, priority, task_status)
         VALUES (%s, %s, %s, %s, 'pending') RETURNING task_id
@@ -473,29 +738,23 @@ def create_task(user_id: int, task_desc: str, task_type: str = 'general', priori
         task_id = cursor.fetchone()['task_id']
         conn.commit()
         return task_id
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def assign_task_to_agent(task_id: int, agent_id: int, order: int = 1):
-    """Assign task to agent"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO task_assignments (task_id, agent_id, assignment_order) VALUES (%s, %s, %s)",
-            (task_id, agent_id, order)
-        )
-        cursor.execute("UPDATE ai_agents SET status = 'busy' WHERE agent_id = %s", (agent_id,))
-        cursor.execute(
-            "UPDATE user_tasks SET task_status = 'assigned', updated_at = CURRENT_TIMESTAMP WHERE task_id = %s",
-            (task_id,)
+    """
+    Assign task to agent (assignment row + task assigned — one statement).
+    The open assignment row is what marks the agent busy; ai_agents isn't touched.
+    """
+    with get_conn() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+        WITH a AS (
+            INSERT INTO task_assignments (task_id, agent_id, assignment_order)
+            VALUES (%(task_id)s, %(agent_id)s, %(order)s)
         )
+        UPDATE user_tasks SET task_status = 'assigned', updated_at = CURRENT_TIMESTAMP
+        WHERE task_id = %(task_id)s
+        """, {"task_id": task_id, "agent_id": agent_id, "order": order})
         conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def store_execution_result(
@@ -506,75 +765,93 @@ def store_execution_result(
     execution_time: float = 0.0,
     error_message: str = None
 ):
-    """Store task execution result"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    """
+    Store task execution result.
+    One CTE chain writes the result row, task status, closes the task's
+    assignment (freeing the agent) and updates agent counters/avg
+    atomically; the performance_metrics snapshot it returns is buffered
+    and written in batches (see _perf_metrics_writer).
+    """
+    status = 'completed' if success else 'failed'
+    exec_time_ms = int(execution_time * 1000)
+    with get_conn() as conn, conn.cursor() as cursor:
         cursor.execute("""
-        INSERT INTO execution_results (task_id, agent_id, output_data, success, error_message, execution_time)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """, (task_id, agent_id, output_data, success, error_message, execution_time))
-
-        status = 'completed' if success else 'failed'
-        cursor.execute(
-            "UPDATE user_tasks SET task_status = %s, updated_at = CURRENT_TIMESTAMP WHERE task_id = %s",
-            (status, task_id)
+        WITH ins AS (
+            INSERT INTO execution_results (task_id, agent_id, output_data, success, error_message, execution_time)
+            VALUES (%(task_id)s, %(agent_id)s, %(output_data)s, %(success)s, %(error_message)s, %(execution_time)s)
+        ), upd_task AS (
+            UPDATE user_tasks SET task_status = %(status)s, updated_at = CURRENT_TIMESTAMP
+            WHERE task_id = %(task_id)s
+        ), done AS (
+            UPDATE task_assignments SET completed_at = CURRENT_TIMESTAMP
+            WHERE task_id = %(task_id)s AND completed_at IS NULL
         )
-
-        if success:
-            cursor.execute("""
-            UPDATE ai_agents
-            SET total_tasks = total_tasks + 1,
-                successful_tasks = successful_tasks + 1,
-                avg_execution_time = (avg_execution_time * total_tasks + %s) / (total_tasks + 1),
-                status = 'idle'
-            WHERE agent_id = %s
-            """, (execution_time, agent_id))
-        else:
-            cursor.execute(
-                "UPDATE ai_agents SET total_tasks = total_tasks + 1, failed_tasks = failed_tasks + 1, status = 'idle' WHERE agent_id = %s",
-                (agent_id,)
-            )
-
-        exec_time_ms = int(execution_time * 1000)
-        cursor.execute("""
-        SELECT CASE WHEN total_tasks > 0 THEN (successful_tasks::float / total_tasks) ELSE 1.0 END as success_rate,
-               cpu_usage, memory_usage FROM ai_agents WHERE agent_id = %s
-        """, (agent_id,))
+        UPDATE ai_agents
+        SET total_tasks        = total_tasks + 1,
+            successful_tasks   = successful_tasks + %(ok)s,
+            failed_tasks       = failed_tasks + 1 - %(ok)s,
+            avg_execution_time = CASE WHEN %(success)s
+                                      THEN (avg_execution_time * total_tasks + %(execution_time)s) / (total_tasks + 1)
+                                      ELSE avg_execution_time END
+        WHERE agent_id = %(agent_id)s
+        RETURNING COALESCE(successful_tasks::float / NULLIF(total_tasks, 0), 1.0) AS success_rate,
+                  cpu_usage, memory_usage
+        """, {
+            "task_id": task_id,
+            "agent_id": agent_id,
+            "output_data": output_data,
+            "success": success,
+            "ok": 1 if success else 0,
+            "error_message": error_message,
+            "execution_time": execution_time,
+            "status": status,
+        })
         perf = cursor.fetchone()
+        conn.commit()
 
-        cursor.execute("""
-        INSERT INTO performance_metrics (agent_id, task_id, exec_time_ms, success_rate, cpu_at_execution, memory_at_execution)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """, (agent_id, task_id, exec_time_ms, perf['success_rate'], perf['cpu_usage'], perf['memory_usage']))
+    if perf:
+        _perf_metrics_writer.put((
+            agent_id, task_id, exec_time_ms,
+            perf['success_rate'], perf['cpu_usage'], perf['memory_usage'],
+        ))
 
+
+def _write_perf_metrics(rows: List[tuple]) -> None:
+    with get_conn() as conn, conn.cursor() as cursor:
+        execute_batch(
+            cursor,
+            """
+            INSERT INTO performance_metrics
+                (agent_id, task_id, exec_time_ms, success_rate, cpu_at_execution, memory_at_execution)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (task_id) DO NOTHING
+            """,
+            rows,
+            page_size=100,
+        )
         conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+
+
+# A burst of completions becomes one batched INSERT instead of one per task
+_perf_metrics_writer = BatchWriter(
+    "perf-metrics-writer",
+    _write_perf_metrics,
+    max_rows=50,
+    interval_s=0.1,
+)
 
 
 def queue_task(task_id: int, priority: int = 1):
     """Add task to queue"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO task_queue (task_id, priority) VALUES (%s, %s) ON CONFLICT (task_id) DO UPDATE SET priority = EXCLUDED.priority",
-            (task_id, priority)
-        )
+    with get_conn() as conn, conn.cursor() as cursor:
+        cursor.execute("EXECUTE queue_upsert (%s, %s)", (task_id, priority))
         cursor.execute("UPDATE user_tasks SET task_status = 'queued' WHERE task_id = %s", (task_id,))
         conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def get_next_queued_task() -> Optional[Dict]:
     """Get next task from queue"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn(readonly=True) as conn, conn.cursor() as cursor:
         cursor.execute("""
         SELECT ut.*, tq.priority, tq.attempts FROM user_tasks ut
         JOIN task_queue tq ON ut.task_id = tq.task_id
@@ -582,43 +859,64 @@ def get_next_queued_task() -> Optional[Dict]:
         ORDER BY tq.priority DESC, tq.queued_at ASC LIMIT 1
         """)
         return cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
 
 # =============================================================================
 # CONTEXT MANAGEMENT
 # =============================================================================
 
-def store_context(task_id: int, context_data: str, context_type: str = 'conversation'):
-    """Store context data for task"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+def store_context(task_id: int, context_data: str, context_type: str = 'conversation', simhash: int = None):
+    """
+    Store context data for task.
+    simhash: optional 64-bit signature of the task description (see
+    ai_router.compute_simhash); stored as a signed BIGINT.
+    """
+    if simhash is not None and simhash >= 1 << 63:
+        simhash -= 1 << 64
+    with get_conn() as conn, conn.cursor() as cursor:
         cursor.execute(
-            "INSERT INTO context_data (task_id, context_data, context_type) VALUES (%s, %s, %s)",
-            (task_id, context_data, context_type)
+            "EXECUTE ctx_insert (%s, %s, %s, %s)",
+            (task_id, context_data, context_type, simhash)
+        )
+        conn.commit()
+
+
+def store_contexts_bulk(rows: List[Tuple[int, str, str]]) -> None:
+    """Store many (task_id, context_data, context_type) rows with multi-row INSERTs"""
+    if not rows:
+        return
+    with get_conn() as conn, conn.cursor() as cursor:
+        execute_values(
+            cursor,
+            "INSERT INTO context_data (task_id, context_data, context_type) VALUES %s",
+            rows,
+            page_size=BULK_PAGE_SIZE,
         )
         conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def get_recent_contexts(limit: int = 10) -> List[Dict]:
-    """Get recent context data"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-        SELECT cd.*, ut.task_desc, ut.task_type FROM context_data cd
-        JOIN user_tasks ut ON cd.task_id = ut.task_id
-        ORDER BY cd.updated_at DESC LIMIT %s
-        """, (limit,))
-        return cursor.fetchall()
-    finally:
-        cursor.close()
-        conn.close()
+    """
+    Get recent context data.
+    Large limits stream through a server-side (named) cursor, STREAM_ITERSIZE
+    rows per FETCH, instead of the whole JOIN landing in one client buffer.
+    """
+    sql = """
+    SELECT cd.*, ut.task_desc, ut.task_type FROM context_data cd
+    JOIN user_tasks ut ON cd.task_id = ut.task_id
+    ORDER BY cd.updated_at DESC LIMIT %s
+    """
+    # Named cursors need a transaction, so only the small path gets autocommit
+    with get_conn(readonly=limit <= STREAM_ITERSIZE) as conn:
+        if limit <= STREAM_ITERSIZE:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, (limit,))
+                return cursor.fetchall()
+
+        # Named cursors live inside a transaction; release_connection rolls it back
+        with conn.cursor(name="ctx_stream") as cursor:
+            cursor.itersize = STREAM_ITERSIZE
+            cursor.execute(sql, (limit,))
+            return list(cursor)
 
 
 def get_last_n_messages(conversation_id: str, n: int = 10) -> List[Dict]:
@@ -628,45 +926,43 @@ def get_last_n_messages(conversation_id: str, n: int = 10) -> List[Dict]:
     """
     if not conversation_id:
         return []
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-        SELECT message_id, role, content, timestamp FROM messages
-        WHERE conversation_id = %s ORDER BY timestamp DESC LIMIT %s
-        """, (conversation_id, n))
-        messages = cursor.fetchall()
-        return list(reversed(messages))
-    except Exception as e:
-        print(f"⚠️ get_last_n_messages error: {e}")
-        return []
-    finally:
-        cursor.close()
-        conn.close()
+    with get_conn(readonly=True) as conn, conn.cursor() as cursor:
+        try:
+            # Inner query walks idx_messages_conv_time backwards and stops after n
+            # rows; the outer ORDER BY hands them back oldest-first. age_seconds
+            # is measured against the server clock the timestamps came from.
+            cursor.execute("""
+            SELECT message_id, role, content, timestamp,
+                   EXTRACT(EPOCH FROM LOCALTIMESTAMP - timestamp)::float8 AS age_seconds FROM (
+                SELECT message_id, role, content, timestamp FROM messages
+                WHERE conversation_id = %s ORDER BY timestamp DESC LIMIT %s
+            ) recent
+            ORDER BY timestamp ASC
+            """, (conversation_id, n))
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"⚠️ get_last_n_messages error: {e}")
+            return []
 
 
 def create_or_get_conversation(conversation_id: str, user_id: int = 1) -> str:
     """Create a new conversation or get existing one. Returns conversation_id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-        INSERT INTO conversations (conversation_id, user_id, started_at, last_updated, is_active)
-        VALUES (%s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, TRUE)
-        ON CONFLICT (conversation_id)
-        DO UPDATE SET last_updated = CURRENT_TIMESTAMP, is_active = TRUE
-        RETURNING conversation_id
-        """, (conversation_id, user_id))
-        result = cursor.fetchone()
-        conn.commit()
-        return result['conversation_id']
-    except Exception as e:
-        conn.rollback()
-        print(f"⚠️ create_or_get_conversation error: {e}")
-        return conversation_id
-    finally:
-        cursor.close()
-        conn.close()
+    with get_conn() as conn, conn.cursor() as cursor:
+        try:
+            cursor.execute("""
+            INSERT INTO conversations (conversation_id, user_id, started_at, last_updated, is_active)
+            VALUES (%s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, TRUE)
+            ON CONFLICT (conversation_id)
+            DO UPDATE SET last_updated = CURRENT_TIMESTAMP, is_active = TRUE
+            RETURNING conversation_id
+            """, (conversation_id, user_id))
+            result = cursor.fetchone()
+            conn.commit()
+            return result['conversation_id']
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"⚠️ create_or_get_conversation error: {e}")
+            return conversation_id
 
 
 def store_message(conversation_id: str, role: str, content: str) -> Optional[int]:
@@ -677,62 +973,116 @@ def store_message(conversation_id: str, role: str, content: str) -> Optional[int
     """
     if not conversation_id or not role or not content:
         return None
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        create_or_get_conversation(conversation_id)
-        cursor.execute("""
-        INSERT INTO messages (conversation_id, role, content, timestamp)
-        VALUES (%s, %s, %s, CURRENT_TIMESTAMP) RETURNING message_id
-        """, (conversation_id, role, content))
-        result = cursor.fetchone()
+    with get_conn() as conn, conn.cursor() as cursor:
+        try:
+            cursor.execute("EXECUTE msg_insert (%s, %s, %s)", (conversation_id, role, content))
+            result = cursor.fetchone()
+            conn.commit()
+            return result['message_id']
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"⚠️ store_message error: {e}")
+            return None
+
+def store_messages_bulk(rows: List[Tuple[str, str, str]]) -> List[int]:
+    """
+    Store many (conversation_id, role, content) rows with multi-row INSERTs.
+    Conversations are upserted first (one statement for all distinct ids).
+    Returns the new message_ids in input order.
+    """
+    rows = [r for r in rows if r[0] and r[1] and r[2]]
+    if not rows:
+        return []
+    conversation_ids = sorted({r[0] for r in rows})
+    with get_conn() as conn, conn.cursor() as cursor:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO conversations (conversation_id, user_id, started_at, last_updated, is_active)
+            VALUES %s
+            ON CONFLICT (conversation_id)
+            DO UPDATE SET last_updated = CURRENT_TIMESTAMP, is_active = TRUE
+            """,
+            [(cid,) for cid in conversation_ids],
+            template="(%s, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, TRUE)",
+            page_size=BULK_PAGE_SIZE,
+        )
+        result = execute_values(
+            cursor,
+            "INSERT INTO messages (conversation_id, role, content, timestamp) VALUES %s RETURNING message_id",
+            rows,
+            template="(%s, %s, %s, CURRENT_TIMESTAMP)",
+            page_size=BULK_PAGE_SIZE,
+            fetch=True,
+        )
         conn.commit()
-        return result['message_id']
-    except Exception as e:
-        conn.rollback()
-        print(f"⚠️ store_message error: {e}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+        return [r['message_id'] for r in result]
 
 # =============================================================================
 # LOGGING
 # =============================================================================
 
+def log_system_events_bulk(rows: List[Tuple[str, str]]) -> None:
+    """Insert many (log_type, message) rows with multi-row INSERTs"""
+    if not rows:
+        return
+    with get_conn() as conn, conn.cursor() as cursor:
+        try:
+            execute_values(
+                cursor,
+                "INSERT INTO system_logs (log_type, message) VALUES %s",
+                rows,
+                page_size=BULK_PAGE_SIZE,
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"⚠️ log_system_events_bulk error ({len(rows)} rows): {e}")
+
+
+# Write-behind queue: callers never wait on the DB for a log line.
+# Bounded so a DB outage can't grow memory without limit; overflow is dropped.
+SYSTEM_LOG_QUEUE_MAX = 10_000
+
+_system_log_writer = BatchWriter(
+    "system-log-writer",
+    log_system_events_bulk,
+    max_rows=200,
+    interval_s=0.1,
+    maxsize=SYSTEM_LOG_QUEUE_MAX,
+)
+
+
 def log_system_event(log_type: str, message: str, **kwargs):
     """
-    Log a system event.
+    Log a system event (queued; written in batches by a background thread).
     **kwargs absorbs any legacy keyword arguments so old call sites don't crash.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO system_logs (log_type, message) VALUES (%s, %s)", (log_type, message))
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        print(f"⚠️ log_system_event error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    _system_log_writer.put((log_type, message))
+
+
+def flush_system_logs() -> None:
+    """Write any queued system_logs rows now (also runs at interpreter exit)"""
+    _system_log_writer.flush()
 
 # =============================================================================
 # STATISTICS
 # =============================================================================
 
+@_ttl_cached(ttl=2.0)
 def get_system_stats() -> Dict:
     """Get overall system statistics"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    with get_conn(readonly=True) as conn, conn.cursor() as cursor:
         stats = {}
-        cursor.execute("""
+        cursor.execute(f"""
         SELECT COUNT(*) as total_agents,
-               COUNT(CASE WHEN status = 'idle' THEN 1 END) as idle_agents,
-               COUNT(CASE WHEN status = 'busy' THEN 1 END) as busy_agents,
+               COUNT(CASE WHEN status = 'idle' AND NOT busy THEN 1 END) as idle_agents,
+               COUNT(CASE WHEN busy THEN 1 END) as busy_agents,
                AVG(cpu_usage) as avg_cpu, AVG(memory_usage) as avg_memory
-        FROM ai_agents WHERE last_heartbeat > NOW() - INTERVAL '30 seconds'
+        FROM (
+            SELECT a.status, a.cpu_usage, a.memory_usage, {_AGENT_BUSY} AS busy
+            FROM ai_agents a WHERE a.last_heartbeat > NOW() - INTERVAL '30 seconds'
+        ) live
         """)
         stats['agents'] = dict(cursor.fetchone())
 
@@ -753,16 +1103,13 @@ def get_system_stats() -> Dict:
         stats['performance'] = dict(perf) if perf else {}
 
         return stats
-    finally:
-        cursor.close()
-        conn.close()
 
 # =============================================================================
 # MASTER FAILOVER COMPATIBILITY
 # =============================================================================
 
 def register_master(master_id: str, host: str = "localhost", port: int = 8000):
-    print(f"⚠️  Master registration skipped (new schema doesn't use master_states)")
+    logger.warning(f"⚠️  Master registration skipped (new schema doesn't use master_states)")
     return True
 
 def update_master_heartbeat(master_id: str, status: str = "active"):
@@ -777,16 +1124,6 @@ def get_active_master() -> Optional[Dict]:
 def get_all_masters() -> List[Dict]:
     return [{"master_id": "master-1", "status": "active", "active": True, "last_heartbeat": datetime.now(timezone.utc).isoformat()}]
 
-# =============================================================================
-# AUTO-INITIALIZATION ON MODULE IMPORT
-# =============================================================================
-
-try:
-    init_database()
-except Exception as e:
-    print(f"⚠️  Warning: Could not auto-initialize database: {e}")
-    print("   Database will be initialized on first connection attempt")
-
 if __name__ == "__main__":
     print("Running database initialization manually...")
-    init_database()
\ No newline at end of file
+    _ensure_initialized()
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""
+E.V.E. Keyword Matcher — backend/core/keyword_match.py
+
+Compiles a fixed keyword list once into a single-pass substring matcher:
+an Aho-Corasick automaton when pyahocorasick is installed, otherwise one
+alternation regex. Either way a lookup is one scan of the text instead of
+one `keyword in text` scan per keyword.
+"""
+import re
+from typing import Callable, Iterable, Optional
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def compile_keywords(keywords: Iterable[str]) -> Callable[[str], Optional[str]]:
+    """
+    Return match(text) -> the first keyword found as a substring of text, or None.
+    text is expected to be lowercased already, like the keywords.
+    """
+    keywords = [k for k in dict.fromkeys(keywords) if k]
+    if not keywords:
+        return lambda text: None
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+
+        def match(text: str) -> Optional[str]:
+            hit = next(automaton.iter(text), None)
+            return hit[1] if hit else None
+        return match
+
+    # Longest first so "and also" wins over "also" at the same position
+    pattern = re.compile("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+
+    def match(text: str) -> Optional[str]:
+        m = pattern.search(text)
+        return m.group(0) if m else None
+    return match
@@ -0,0 +1,47 @@
+"""
+E.V.E. Logging — backend/core/logger.py
+
+Request paths log through the "eve" logger. Its only handler is a
+QueueHandler, so a log call is a non-blocking enqueue; a single
+QueueListener thread does the actual stdout writes, flushing once per
+drained batch instead of once per record.
+"""
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from core.config import LOG_LEVEL, LOG_FORMAT
+
+
+class _BatchedStreamHandler(logging.StreamHandler):
+    """StreamHandler that only flushes when the listener's queue is drained"""
+
+    def __init__(self, stream, log_queue: queue.Queue):
+        super().__init__(stream)
+        self._log_queue = log_queue
+
+    def flush(self):
+        if self._log_queue.empty():
+            super().flush()
+
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+
+_stream_handler = _BatchedStreamHandler(sys.stdout, _log_queue)
+_stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+_listener = QueueListener(_log_queue, _stream_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+logger = logging.getLogger("eve")
+logger.setLevel(LOG_LEVEL)
+logger.addHandler(QueueHandler(_log_queue))
+logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Child of the "eve" logger, e.g. get_logger(__name__)"""
+    return logger.getChild(name)
@@ -0,0 +1,65 @@
+"""
+E.V.E. Mailer — backend/core/mailer.py
+
+Keeps one authenticated SMTP session per process instead of doing
+EHLO/STARTTLS/LOGIN for every email. The session is opened lazily,
+guarded by a lock, and re-established once if the server dropped it.
+"""
+import os
+import smtplib
+import threading
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv())
+
+SMTP_HOST     = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT     = int(os.getenv("SMTP_PORT", 587))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+
+_smtp = None
+_smtp_lock = threading.Lock()
+
+
+def _connect() -> smtplib.SMTP:
+    s = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    s.ehlo(); s.starttls(); s.ehlo()
+    s.login(SMTP_USERNAME, SMTP_PASSWORD)
+    return s
+
+
+def _drop_connection() -> None:
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.close()
+        except Exception:
+            pass
+    _smtp = None
+
+
+def send_html_email(to_email: str, subject: str, html: str) -> None:
+    """Send an HTML email over the shared SMTP session (blocking)."""
+    global _smtp
+
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"]    = SMTP_USERNAME
+    msg["To"]      = to_email
+    msg.attach(MIMEText(html, "html"))
+    raw = msg.as_string()
+
+    with _smtp_lock:
+        for attempt in range(2):
+            try:
+                if _smtp is None:
+                    _smtp = _connect()
+                _smtp.sendmail(SMTP_USERNAME, to_email, raw)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Idle session timed out on the server side — reconnect once
+                _drop_connection()
+                if attempt == 1:
+                    raise
@@ -1,22 +1,29 @@
 # functions for user security 
 
 
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
-from jose import jwt
-from datetime import datetime, timedelta
-from core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS
 
 
 # =============================================================================
 # HASHES PASSWORD USING BCRYPT
 # =============================================================================
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
+def hash_password(password: str, rounds: int = None) -> str:
+    """Hash a password using bcrypt (cost defaults to BCRYPT_ROUNDS)"""
     # Encode password to bytes
     password_bytes = password.encode('utf-8')
     # Generate salt and hash
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     # Return as string
     return hashed.decode('utf-8')
@@ -36,6 +43,67 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         print(f"Password verification error: {e}")
         return False
     
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the stored hash ($2b$<cost>$...) wasn't made with BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+# =============================================================================
+# ASYNC WRAPPERS - RUN BCRYPT OFF THE EVENT LOOP
+# =============================================================================
+
+# bcrypt releases the GIL, so a small dedicated thread pool spreads hashing
+# across cores without starving FastAPI's shared threadpool.
+_BCRYPT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 2,
+    thread_name_prefix="bcrypt"
+)
+
+
+async def hash_password_async(password: str, rounds: int = None) -> str:
+    """hash_password on the bcrypt pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_BCRYPT_EXECUTOR, hash_password, password, rounds)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_BCRYPT_EXECUTOR, verify_password, plain_password, hashed_password)
+
+# =============================================================================
+# HS256 JWT - KEY AND HEADER PREPARED ONCE
+# =============================================================================
+
+# Tokens are HS256 only. The HMAC key schedule runs once here; each sign /
+# verify copies the keyed prototype instead of re-deriving it from SECRET_KEY.
+if ALGORITHM != "HS256":
+    raise ValueError(f"Unsupported JWT algorithm: {ALGORITHM}")
+
+_HMAC_PROTO = hmac.new(SECRET_KEY.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _b64url_encode(raw: bytes) -> bytes:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+
+def _b64url_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+def _sign(signing_input: bytes) -> bytes:
+    mac = _HMAC_PROTO.copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+_HEADER_SEGMENT = _b64url_encode(
+    json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode()
+)
+
 # =============================================================================
 # CREATES SESSION TOKEN USING JWT 
 # =============================================================================
@@ -44,19 +112,31 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def create_access_token(data: dict) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode["exp"] = int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    payload_segment = _b64url_encode(json.dumps(to_encode, separators=(",", ":")).encode())
+    signing_input = _HEADER_SEGMENT + b"." + payload_segment
+    return (signing_input + b"." + _b64url_encode(_sign(signing_input))).decode("ascii")
 
 # =============================================================================
 # DECODES THE TOKEN TO SEE IF ITS VALID
 # =============================================================================
 
 def decode_access_token(token: str) -> dict:
-    """Decode JWT access token"""
+    """Decode JWT access token; None if malformed, badly signed or expired"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except:
-        return None
\ No newline at end of file
+        signing_input, _, signature = token.encode("ascii").rpartition(b".")
+        header_segment, _, payload_segment = signing_input.partition(b".")
+        if json.loads(_b64url_decode(header_segment)).get("alg") != "HS256":
+            return None
+        if not hmac.compare_digest(_sign(signing_input), _b64url_decode(signature)):
+            return None
+        payload = json.loads(_b64url_decode(payload_segment))
+    except (ValueError, UnicodeError, AttributeError, TypeError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    exp = payload.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float)) or time.time() >= exp):
+        return None
+    return payload
@@ -10,16 +10,32 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from api.routers import auth, tasks, feedback, forgot_password, verify_email, profile
+from core.async_db import init_async_pool, close_async_pool
+from core.config import SERVE_STATIC_FILES
+from api.middleware import MaxBodySizeMiddleware
+from api.routers.profile import MAX_SIZE_BYTES
+import socket
 import subprocess
 import sys
 import os
 import threading
 import time
 
-app = FastAPI(title="E.V.E Backend")
+# orjson serializes every JSON response (auth, profile, tasks...)
+app = FastAPI(title="E.V.E Backend", default_response_class=ORJSONResponse)
+
+# Avatar uploads are capped at MAX_SIZE_BYTES; leave room for multipart framing.
+# Only the avatar route is limited - chat attachments (/api/tasks) can be larger.
+# Added before CORS so the 413 still carries CORS headers.
+app.add_middleware(
+    MaxBodySizeMiddleware,
+    max_bytes=MAX_SIZE_BYTES + 64 * 1024,
+    paths=("/api/profile/avatar",),
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,10 +46,12 @@ app.add_middleware(
 )
 
 # Serve uploaded avatars as static files
-# Avatars are saved to static/avatars/ by the profile router
+# Avatars are saved to static/avatars/ by the profile router.
+# In production nginx/CDN serves them instead (SERVE_STATIC_FILES=false).
 static_dir = Path("static")
 static_dir.mkdir(exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+if SERVE_STATIC_FILES:
+    app.mount("/static", StaticFiles(directory="static"), name="static")
 
 app.include_router(auth.router)
 app.include_router(tasks.router)
@@ -43,6 +61,16 @@ app.include_router(verify_email.router)
 app.include_router(profile.router)
 
 
+@app.on_event("startup")
+async def _open_async_db():
+    await init_async_pool()
+
+
+@app.on_event("shutdown")
+async def _close_async_db():
+    await close_async_pool()
+
+
 @app.get("/")
 def root():
     return {"message": "E.V.E Backend is running on port 8000"}
@@ -60,11 +88,23 @@ def health():
 _eve_process = None
 
 
+def _wait_for_port(port: int, timeout: float = 10.0, interval: float = 0.05) -> bool:
+    """Poll until something accepts connections on localhost:port (or timeout)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return True
+        except OSError:
+            time.sleep(interval)
+    return False
+
+
 def _start_eve_system():
     """Launch start_system.py after uvicorn has fully bound port 8000."""
     global _eve_process
 
-    time.sleep(3)
+    _wait_for_port(8000)
 
     project_root = os.path.dirname(os.path.abspath(__file__))
     start_script = os.path.join(project_root, "start_system.py")
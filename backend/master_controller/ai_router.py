@@ -7,110 +7,42 @@ Implements 3-Layer Intelligence:
 PLUS: Hardware-aware routing (CPU, RAM, Temperature consideration)
 """
 
+import hashlib
+import threading
+from array import array
+from functools import lru_cache
+import orjson
 from typing import Dict, List, Optional, Tuple
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
+from core.keyword_match import compile_keywords
+from core.logger import get_logger
+
 try:
     from backend.core.database import (
-        get_available_agents, get_agent_performance, 
+        get_best_agent,
         assign_task_to_agent, queue_task, get_next_queued_task,
         store_context, get_recent_contexts, log_system_event
     )
 except ImportError:
     print("⚠️  Using fallback imports...")
     from backend.core.database import (
-        get_available_agents, get_agent_performance,
+        get_best_agent,
         assign_task_to_agent, queue_task, get_next_queued_task,
         store_context, get_recent_contexts, log_system_event
     )
 
-# =============================================================================
-# LAYER A: SELF-LEARNING ROUTING
-# =============================================================================
-
-def select_best_agent_by_performance(task_type: str, available_agents: List[Dict]) -> Optional[Dict]:
-    """
-    INTELLIGENCE LAYER A: Self-Learning
-    Selects agent based on historical performance and success rate
-    """
-    if not available_agents:
-        return None
-    
-    # Score each agent
-    scored_agents = []
-    for agent in available_agents:
-        agent_id = agent['agent_id']
-        perf = get_agent_performance(agent_id)
-        
-        if not perf:
-            continue
-        
-        # Calculate score based on:
-        # - Success rate (50% weight)
-        # - Execution speed (30% weight)
-        # - Total successful tasks (20% weight)
-        success_rate = perf.get('success_rate', 0) / 100.0
-        
-        # Normalize execution time (lower is better)
-        avg_time = perf.get('avg_execution_time', 1.0)
-        time_score = 1.0 / (1.0 + avg_time / 10.0)  # Normalize to 0-1
-        
-        # Experience score
-        successful_tasks = perf.get('successful_tasks', 0)
-        experience_score = min(successful_tasks / 100.0, 1.0)  # Cap at 100 tasks
-        
-        # Combined score
-        total_score = (
-            success_rate * 0.5 +
-            time_score * 0.3 +
-            experience_score * 0.2
-        )
-        
-        scored_agents.append({
-            'agent': agent,
-            'score': total_score,
-            'success_rate': perf.get('success_rate', 0),
-            'avg_time': avg_time
-        })
-        
-        print(f"   📊 {agent['agent_name']}: Score={total_score:.3f} | Success={perf.get('success_rate', 0):.1f}% | Avg Time={avg_time:.2f}s")
-    
-    if not scored_agents:
-        return available_agents[0]  # Fallback to first agent
-    
-    # Return best scoring agent
-    best = max(scored_agents, key=lambda x: x['score'])
-    print(f"   ✨ Selected: {best['agent']['agent_name']} (Score: {best['score']:.3f})")
-    return best['agent']
+# Per-task routing traces are DEBUG: a no-op at the default INFO level
+logger = get_logger("ai_router")
 
 # =============================================================================
-# HARDWARE-AWARE ROUTING
+# LAYER A: SELF-LEARNING ROUTING
+# Scoring (success rate / speed / experience) and the hardware-health check
+# run in SQL — see core.database.get_best_agent().
 # =============================================================================
 
-def filter_by_hardware_health(agents: List[Dict], cpu_threshold: float = 80.0, 
-                               memory_threshold: float = 90.0) -> List[Dict]:
-    """
-    Filter agents based on hardware health
-    Avoids overloaded agents
-    """
-    healthy_agents = []
-    
-    for agent in agents:
-        cpu = agent.get('cpu_usage', 0)
-        memory = agent.get('memory_usage', 0)
-        temp = agent.get('temperature', 0)
-        
-        # Check if agent is healthy
-        if cpu < cpu_threshold and memory < memory_threshold:
-            healthy_agents.append(agent)
-            print(f"   ✅ {agent['agent_name']}: CPU={cpu}% RAM={memory}% Temp={temp}°C - Healthy")
-        else:
-            print(f"   ⚠️  {agent['agent_name']}: CPU={cpu}% RAM={memory}% - Overloaded (skipped)")
-    
-    return healthy_agents if healthy_agents else agents  # Return all if none healthy
-
 # =============================================================================
 # LAYER B: MULTI-AGENT FALLBACK
 # =============================================================================
@@ -129,46 +61,36 @@ async def route_with_fallback(
     - If all busy, queue task
     - If all fail, use master's own brain (Groq)
     """
-    print(f"\n🔍 Routing Task {task_id} (Type: {task_type})")
+    logger.debug(f"🔍 Routing Task {task_id} (Type: {task_type})")
     
-    # Get available agents
-    agents = get_available_agents(task_type)
+    # LAYER A + hardware check in one query: healthy agents first, then the
+    # self-learning score (success rate / speed / experience), LIMIT 1
+    best_agent = get_best_agent(task_type)
     
-    if not agents:
-        print("   ⚠️  No agents available!")
+    if not best_agent:
+        logger.warning("   ⚠️  No agents available!")
         if use_master_brain:
-            print("   🧠 Will use Master's own brain (Groq)")
+            logger.debug("   🧠 Will use Master's own brain (Groq)")
             return None, "master_brain"
         else:
-            print("   📥 Queueing task...")
+            logger.debug("   📥 Queueing task...")
             queue_task(task_id, priority=1)
             return None, "queued"
     
-    # Filter by hardware health
-    healthy_agents = filter_by_hardware_health(agents)
-    
-    if not healthy_agents:
-        print("   ⚠️  All agents overloaded!")
-        queue_task(task_id, priority=2)  # Higher priority for overload
-        return None, "queued_overload"
-    
-    # SELF-LEARNING: Select best agent by performance (even if busy)
-    print("\n   📈 Self-Learning Agent Selection:")
-    best_agent = select_best_agent_by_performance(task_type, healthy_agents)
-    
-    if not best_agent:
-        print("   ❌ No suitable agent found")
-        queue_task(task_id, priority=1)
-        return None, "queued_no_match"
+    logger.debug(
+        f"   📊 {best_agent['agent_name']}: Score={best_agent['score']:.3f} | "
+        f"Success={best_agent['success_rate']:.1f}% | "
+        f"CPU={best_agent['cpu_usage']}% RAM={best_agent['memory_usage']}%"
+    )
     
     # Check if best agent is busy
-    if best_agent['status'] == 'busy':
-        print(f"   ⏳ Best agent ({best_agent['agent_name']}) is busy - queueing for this specific worker")
+    if best_agent['is_busy']:
+        logger.debug(f"   ⏳ Best agent ({best_agent['agent_name']}) is busy - queueing for this specific worker")
         queue_task(task_id, priority=1)
         return None, f"queued_for_{best_agent['agent_name']}"
     
     # Agent is idle and ready!
-    print(f"   ✨ Selected: {best_agent['agent_name']} (Ready)")
+    logger.debug(f"   ✨ Selected: {best_agent['agent_name']} (Ready)")
     best_agent = best_agent
     
     # Assign task to the selected best agent
@@ -186,11 +108,134 @@ async def route_with_fallback(
 # LAYER C: CONTEXT-AWARE ROUTING
 # =============================================================================
 
-def analyze_context_for_multi_step(task_desc: str, recent_tasks: List[Dict]) -> Dict:
+# Keywords indicating multi-step tasks
+MULTI_STEP_KW = (
+    "then", "after that", "next", "also", "and also",
+    "continue", "following", "step", "first", "second"
+)
+_match_multi_step = compile_keywords(MULTI_STEP_KW)
+
+
+# Signatures closer than this many differing bits mark a related task
+SIMHASH_MAX_DISTANCE = 16
+
+# SimHash over a handful of words is mostly noise ("what is python" vs
+# "what is java" land 12 bits apart), so a pair is only compared by
+# signature when both sides have this many distinct words; otherwise the
+# old check applies: more than MIN_SHARED_WORDS words in common.
+SIMHASH_MIN_TOKENS = 8
+MIN_SHARED_WORDS = 3
+
+_SIMHASH_MASK = (1 << 64) - 1
+
+# C-level popcount on Python 3.10+, string count before that
+_popcount = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+
+def compute_simhash(text: str) -> int:
+    """
+    64-bit SimHash of the lowercased words in text: every word's blake2b
+    hash votes +1/-1 per bit, and the sign of each tally is the signature bit.
+    Similar texts end up a small Hamming distance apart.
+    """
+    return _simhash_lowered(text.lower())
+
+
+@lru_cache(maxsize=1024)
+def _simhash_lowered(text_lower: str) -> int:
+    """compute_simhash for text that is already lowercased"""
+    # One b"0101..." row per token (MSB first); zip(*rows) hands back the
+    # bit columns, so each tally is a C-level sum instead of 64 Python
+    # steps per token.
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little"), "064b").encode()
+        for token in text_lower.split()
+    ]
+    # A column sums to 48*n plus its number of 1s; set the bit on a strict majority
+    majority = 48 * len(rows) + len(rows) / 2
+    sig = 0
+    for i, column in enumerate(zip(*rows)):
+        if sum(column) > majority:
+            sig |= 1 << (63 - i)
+    return sig
+
+
+def find_related(query_sig: int, query_words: frozenset, sigs: List[int], words: List[frozenset],
+                 max_distance: int = SIMHASH_MAX_DISTANCE) -> List[int]:
+    """
+    Indices of related entries: within max_distance differing bits when both
+    texts are long enough for SimHash, else more than MIN_SHARED_WORDS shared words
+    """
+    q = query_sig & _SIMHASH_MASK
+    query_long = len(query_words) >= SIMHASH_MIN_TOKENS
+    return [
+        i for i, (sig, other) in enumerate(zip(sigs, words))
+        if (_popcount(q ^ (sig & _SIMHASH_MASK)) < max_distance
+            if query_long and len(other) >= SIMHASH_MIN_TOKENS
+            else len(query_words & other) > MIN_SHARED_WORDS)
+    ]
+
+
+# How many of the latest contexts a new task is compared against
+RECENT_CONTEXT_LIMIT = 10
+
+
+class _ContextRing:
+    """
+    Process-lifetime ring of the latest stored contexts as two parallel
+    int64 arrays (task ids, signed simhashes) plus each task's word set for
+    the short-text fallback. Routing reads the newest entries by index
+    instead of querying context_data and building a dict per row; the
+    table itself is still written by store_context.
+    """
+    
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.ids = array('q', bytes(8 * size))
+        self.sigs = array('q', bytes(8 * size))
+        self.words: List[frozenset] = [frozenset()] * size
+        self.head = 0
+        self.count = 0
+        self.seeded = False
+        self._lock = threading.Lock()
+    
+    def append(self, task_id: int, sig: int, words: frozenset):
+        if sig >= 1 << 63:
+            sig -= 1 << 64
+        with self._lock:
+            self.ids[self.head] = task_id
+            self.sigs[self.head] = sig
+            self.words[self.head] = words
+            self.head = (self.head + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+    
+    def latest(self, n: int) -> Tuple[List[int], List[int], List[frozenset]]:
+        """(task_ids, sigs, word sets) of the newest n entries, newest first"""
+        with self._lock:
+            slots = [(self.head - 1 - k) % self.size for k in range(min(n, self.count))]
+            return [self.ids[i] for i in slots], [self.sigs[i] for i in slots], [self.words[i] for i in slots]
+    
+    def seed(self, recent_tasks: List[Dict]):
+        """Load rows from get_recent_contexts() (newest first) after a restart"""
+        for recent in reversed(recent_tasks):
+            desc_lower = (recent.get('task_desc') or '').lower()
+            sig = recent.get('simhash')
+            if sig is None:
+                sig = _simhash_lowered(desc_lower)
+            self.append(recent['task_id'], sig, frozenset(desc_lower.split()))
+        self.seeded = True
+
+
+_context_ring = _ContextRing()
+
+
+def analyze_context_for_multi_step(task_desc: str, recent_tasks: Optional[List[Dict]] = None) -> Dict:
     """
     INTELLIGENCE LAYER C: Context-Aware Analysis
     Detects if task is part of multi-step sequence
     Maintains context across related tasks
+    recent_tasks: get_recent_contexts()-style rows; defaults to the
+    in-process ring of the latest RECENT_CONTEXT_LIMIT contexts.
     """
     context_analysis = {
         "is_multi_step": False,
@@ -199,31 +244,33 @@ def analyze_context_for_multi_step(task_desc: str, recent_tasks: List[Dict]) ->
         "context_type": "single"
     }
     
-    # Keywords indicating multi-step tasks
-    multi_step_keywords = [
-        "then", "after that", "next", "also", "and also",
-        "continue", "following", "step", "first", "second"
-    ]
-    
+    # Lowercased once; both the keyword scan and the signature use it
     task_lower = task_desc.lower()
+    task_sig = _simhash_lowered(task_lower)
+    context_analysis["simhash"] = task_sig
     
     # Check for multi-step indicators
-    for keyword in multi_step_keywords:
-        if keyword in task_lower:
-            context_analysis["is_multi_step"] = True
-            context_analysis["context_type"] = "multi_step"
-            break
+    if _match_multi_step(task_lower) is not None:
+        context_analysis["is_multi_step"] = True
+        context_analysis["context_type"] = "multi_step"
     
     # Find related recent tasks
-    for recent in recent_tasks:
-        recent_desc = recent.get('task_desc', '').lower()
-        # Simple similarity check (can be enhanced with embeddings)
-        common_words = set(task_lower.split()) & set(recent_desc.split())
-        if len(common_words) > 3:  # If >3 common words, likely related
-            context_analysis["related_tasks"].append(recent['task_id'])
+    if recent_tasks is None:
+        recent_ids, recent_sigs, recent_words = _context_ring.latest(RECENT_CONTEXT_LIMIT)
+    else:
+        # (rows stored before signatures existed hash their description on the fly)
+        recent_ids = [recent['task_id'] for recent in recent_tasks]
+        recent_sigs = [
+            recent['simhash'] if recent.get('simhash') is not None
+            else compute_simhash(recent.get('task_desc') or '')
+            for recent in recent_tasks
+        ]
+        recent_words = [frozenset((recent.get('task_desc') or '').lower().split()) for recent in recent_tasks]
+    related = find_related(task_sig, frozenset(task_lower.split()), recent_sigs, recent_words)
+    context_analysis["related_tasks"] = [recent_ids[i] for i in related]
     
     if context_analysis["related_tasks"]:
-        print(f"   🔗 Context: Found {len(context_analysis['related_tasks'])} related tasks")
+        logger.debug(f"   🔗 Context: Found {len(context_analysis['related_tasks'])} related tasks")
         context_analysis["context_type"] = "contextual"
     
     return context_analysis
@@ -237,20 +284,24 @@ async def route_with_context_awareness(
     Route task with context awareness
     Returns: (selected_agent, context_info)
     """
-    print(f"\n🧠 Context-Aware Routing for Task {task_id}")
+    logger.debug(f"🧠 Context-Aware Routing for Task {task_id}")
     
-    # Get recent context
-    recent_contexts = get_recent_contexts(limit=10)
+    # Recent contexts come from the in-process ring; the DB is only read once to seed it
+    if not _context_ring.seeded:
+        _context_ring.seed(get_recent_contexts(limit=RECENT_CONTEXT_LIMIT))
     
     # Analyze context
-    context_info = analyze_context_for_multi_step(task_desc, recent_contexts)
+    context_info = analyze_context_for_multi_step(task_desc)
     
     if context_info["is_multi_step"]:
-        print(f"   ✨ Multi-step task detected! Type: {context_info['context_type']}")
+        logger.debug(f"   ✨ Multi-step task detected! Type: {context_info['context_type']}")
     
     # Store context for this task
-    import json
-    store_context(task_id, json.dumps(context_info), context_type=context_info['context_type'])
+    store_context(
+        task_id, orjson.dumps(context_info).decode(),
+        context_type=context_info['context_type'], simhash=context_info['simhash']
+    )
+    _context_ring.append(task_id, context_info['simhash'], frozenset(task_desc.lower().split()))
     
     # Route with fallback
     agent, status = await route_with_fallback(task_id, task_desc, task_type)
@@ -277,13 +328,10 @@ async def intelligent_route(
     
     Returns: (selected_agent, routing_info)
     """
-    print("\n" + "="*70)
-    print("🧠 INTELLIGENT ROUTING SYSTEM")
-    print("="*70)
-    print(f"Task ID: {task_id}")
-    print(f"Type: {task_type}")
-    print(f"Priority: {priority}")
-    print(f"Description: {task_desc[:100]}...")
+    logger.debug(
+        f"🧠 INTELLIGENT ROUTING: task={task_id} type={task_type} "
+        f"priority={priority} desc={task_desc[:100]}..."
+    )
     
     routing_info = {
         "task_id": task_id,
@@ -309,18 +357,16 @@ async def intelligent_route(
             routing_info["status"] = "assigned"
             routing_info["self_learning_applied"] = True
             
-            print(f"\n✅ Routing Complete: {agent['agent_name']}")
-            print("="*70 + "\n")
+            logger.debug(f"✅ Routing Complete: {agent['agent_name']}")
             
         else:
             routing_info["status"] = "queued_or_master_brain"
-            print(f"\n⏸️  Routing Deferred: Task queued or will use master brain")
-            print("="*70 + "\n")
+            logger.debug(f"⏸️  Routing Deferred: Task queued or will use master brain")
         
         return agent, routing_info
         
     except Exception as e:
-        print(f"❌ Routing error: {e}")
+        logger.error(f"❌ Routing error: {e}")
         log_system_event('error', f"Routing failed for task {task_id}: {e}", task_id=task_id)
         routing_info["status"] = "error"
         routing_info["error"] = str(e)
@@ -334,7 +380,7 @@ async def process_queued_tasks():
     """
     Process tasks from queue when agents become available
     """
-    print("\n🔄 Checking task queue...")
+    logger.debug("🔄 Checking task queue...")
     
     next_task = get_next_queued_task()
     
@@ -345,7 +391,7 @@ async def process_queued_tasks():
     task_desc = next_task['task_desc']
     task_type = next_task.get('task_type', 'general')
     
-    print(f"📋 Processing queued task {task_id}")
+    logger.debug(f"📋 Processing queued task {task_id}")
     
     # Try routing again
     return await intelligent_route(task_id, task_desc, task_type)
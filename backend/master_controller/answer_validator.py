@@ -4,10 +4,97 @@ Validates worker responses before returning to user
 Like a teacher checking student answers
 """
 
-from groq import Groq
-import json
-from typing import Dict, Optional
-from backend.core.config import GROQ_API_KEY
+import orjson
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from backend.core.config import GROQ_API_KEY, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES
+from core.logger import get_logger
+from response_cache import LLMResultCache
+from groq_clients import get_groq, get_async_groq
+
+# Grading rules shared by the single and batch validation prompts
+_EVALUATION_RULES = """EVALUATE THE RESPONSE:
+
+1. Is it COMPLETE? (Does it fully answer the task?)
+   - Yes if: Task is answered, nothing missing
+   - No if: Partial answer, missing key parts
+
+2. Quality Score (0-10):
+   - 9-10: Excellent, comprehensive, correct
+   - 7-8: Good, mostly correct
+   - 5-6: Acceptable but has issues
+   - 3-4: Poor quality, major problems
+   - 0-2: Failed, wrong, or useless
+
+3. Should RETRY?
+   - Yes if: Quality < 6 OR incomplete OR errors detected
+   - No if: Quality >= 6 AND complete
+
+4. Confidence (0.0-1.0): How sure are you of this evaluation?
+
+SPECIAL CASES:
+- If response says "error", "failed", "cannot" → quality=2, retry=true
+- If response is just a greeting for a greeting → quality=10, complete=true
+- If response is code that looks broken → quality=3, retry=true
+- If response is too short (<50 chars) for complex task → quality=4, retry=true
+"""
+
+# Validation reports go through the queued "eve" logger: the caller only
+# enqueues, the listener thread does the stdout writes
+logger = get_logger("answer_validator")
+
+# Validations kept for get_validation_stats (oldest drop off)
+HISTORY_MAX_LEN = 10_000
+
+# Most (task, response) pairs sent to Groq in one batch prompt
+MAX_BATCH_SIZE = 8
+
+# Answers the fast path grades without asking Groq
+_GREETING_RE = re.compile(r"^(?:hi|hello|hey)\b")
+_ERROR_REPLY_RE = re.compile(r"^(?:error|failed|unable|cannot)\b")
+FAST_PATH_MAX_ERROR_LEN = 200
+
+# The grader answers with short keys, decision fields first and a
+# few-word reason, to keep Groq's output (and latency) small
+_SHORT_KEYS = {
+    "qs": "quality_score",
+    "ic": "is_complete",
+    "sr": "should_retry",
+    "cf": "confidence",
+    "r": "reasoning",
+}
+_RESPONSE_LEGEND = "qs = quality score, ic = complete, sr = should retry, cf = confidence, r = reason"
+_RESPONSE_SPEC = '{"qs": 0-10, "ic": true/false, "sr": true/false, "cf": 0.0-1.0, "r": "at most 5 words"}'
+# Output tokens per graded item
+MAX_TOKENS_PER_ITEM = 120
+
+# Decision fields as they stream in; a value only counts once a delimiter follows it
+_STREAM_FIELD_RES = {
+    "is_complete": re.compile(r'"ic"\s*:\s*(true|false)\b'),
+    "quality_score": re.compile(r'"qs"\s*:\s*(\d+(?:\.\d+)?)\s*[,}\n]'),
+    "should_retry": re.compile(r'"sr"\s*:\s*(true|false)\b'),
+}
+# Streamed grades at or above this are accepted without reading the reasoning
+STREAM_ACCEPT_SCORE = 6
+
+# Raw Groq grades keyed by (task, response preview); survives restarts
+_validation_cache = LLMResultCache("validation", LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+
+# The grader only ever sees this many chars of a response
+PREVIEW_CHARS = 1000
+
+
+def _preview(response: str) -> str:
+    """First PREVIEW_CHARS chars + "..." — short responses are passed through, not copied"""
+    if len(response) <= PREVIEW_CHARS:
+        return response
+    return response[:PREVIEW_CHARS] + "..."
+
+
+def _validation_key(task: str, response: str) -> str:
+    return LLMResultCache.make_key(task, _preview(response))
+
 
 class AnswerValidator:
     """
@@ -16,8 +103,16 @@ class AnswerValidator:
     """
     
     def __init__(self, groq_api_key: str):
-        self.client = Groq(api_key=groq_api_key) if groq_api_key else None
-        self.validation_history = []  # Track validations for learning
+        self.client = get_groq(groq_api_key) if groq_api_key else None
+        # Used by validate_answer_async so callers on the event loop don't block on Groq
+        self.async_client = get_async_groq(groq_api_key) if groq_api_key else None
+        self.validation_history = deque(maxlen=HISTORY_MAX_LEN)  # Track validations for learning
+        # Running totals over validation_history, so stats are O(1)
+        self._quality_sum = 0.0
+        self._retry_count = 0
+        self._complete_count = 0
+        self.fast_path_enabled = True  # Grade obvious cases locally (see _fast_validation)
+        self.stream_validation = True  # validate_answer_async stops reading once it can accept
     
     def validate_answer(self, 
                        original_task: str, 
@@ -39,53 +134,302 @@ class AnswerValidator:
         if not self.client:
             return self._basic_validation(response)
         
+        # Obvious case, or same task + response graded before? Skip the Groq call
+        cached = self._quick_validation(original_task, response, worker_name)
+        if cached is not None:
+            return cached
+        
         # Build validation prompt
         prompt = self._build_validation_prompt(original_task, response)
         
         try:
-            result = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.2,
-                response_format={"type": "json_object"}
-            )
-            
-            validation = json.loads(result.choices[0].message.content)
+            result = self.client.chat.completions.create(**self._completion_args(prompt))
+            validation = orjson.loads(result.choices[0].message.content)
+            validation = self._normalize_validation(validation)
+            _validation_cache.put(_validation_key(original_task, response), validation)
+            return self._finish_validation(validation, worker_name)
             
-            # Ensure all required fields
-            validation.setdefault("is_complete", True)
-            validation.setdefault("quality_score", 7)
-            validation.setdefault("should_retry", False)
-            validation.setdefault("reasoning", "Validation complete")
-            validation.setdefault("confidence", 0.8)
-            
-            # Normalize values
-            validation["quality_score"] = max(0, min(10, validation["quality_score"]))
-            validation["confidence"] = max(0.0, min(1.0, validation["confidence"]))
-            
-            # Log validation
-            self.validation_history.append({
-                "worker": worker_name,
-                "quality": validation["quality_score"],
-                "complete": validation["is_complete"],
-                "retry": validation["should_retry"]
-            })
-            
-            # Print validation result
-            self._print_validation(validation, worker_name)
-            
-            return validation
+        except Exception as e:
+            logger.warning(f"⚠️ Validation error: {str(e)[:100]}")
+            return self._basic_validation(response)
+    
+    async def validate_answer_async(self,
+                                    original_task: str,
+                                    response: str,
+                                    worker_name: str = "Unknown") -> Dict:
+        """
+        validate_answer for async callers: awaits the Groq call instead of
+        blocking the event loop for the round trip. Same return shape.
+        """
+        if not self.async_client:
+            return self._basic_validation(response)
+        
+        cached = self._quick_validation(original_task, response, worker_name)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_validation_prompt(original_task, response)
+        
+        try:
+            if self.stream_validation:
+                validation = await self._stream_validation(prompt)
+            else:
+                result = await self.async_client.chat.completions.create(**self._completion_args(prompt))
+                validation = orjson.loads(result.choices[0].message.content)
+            validation = self._normalize_validation(validation)
+            _validation_cache.put(_validation_key(original_task, response), validation)
+            return self._finish_validation(validation, worker_name)
             
         except Exception as e:
-            print(f"⚠️ Validation error: {str(e)[:100]}")
+            logger.warning(f"⚠️ Validation error: {str(e)[:100]}")
             return self._basic_validation(response)
     
+    def validate_answers(self, pairs: List[Tuple[str, str, str]]) -> List[Dict]:
+        """
+        Validate many (task, response, worker_name) triples with one Groq
+        call per MAX_BATCH_SIZE uncached pairs. Results come back in input
+        order, each shaped like validate_answer's.
+        """
+        if not self.client:
+            return [self._basic_validation(response) for _, response, _ in pairs]
+        
+        results = [self._quick_validation(*pair) for pair in pairs]
+        misses = [i for i, r in enumerate(results) if r is None]
+        if len(misses) == 1:
+            results[misses[0]] = self.validate_answer(*pairs[misses[0]])
+            return results
+        
+        for start in range(0, len(misses), MAX_BATCH_SIZE):
+            idx = misses[start:start + MAX_BATCH_SIZE]
+            batch = [pairs[i] for i in idx]
+            try:
+                result = self.client.chat.completions.create(
+                    **self._completion_args(self._build_batch_validation_prompt(batch), len(batch))
+                )
+                graded = self._finish_batch(result.choices[0].message.content, batch)
+            except Exception as e:
+                logger.warning(f"⚠️ Batch validation error: {str(e)[:100]}")
+                graded = [self._basic_validation(response) for _, response, _ in batch]
+            for i, validation in zip(idx, graded):
+                results[i] = validation
+        return results
+    
+    async def validate_answers_async(self, pairs: List[Tuple[str, str, str]]) -> List[Dict]:
+        """validate_answers for async callers (awaits AsyncGroq)"""
+        if not self.async_client:
+            return [self._basic_validation(response) for _, response, _ in pairs]
+        
+        results = [self._quick_validation(*pair) for pair in pairs]
+        misses = [i for i, r in enumerate(results) if r is None]
+        if len(misses) == 1:
+            results[misses[0]] = await self.validate_answer_async(*pairs[misses[0]])
+            return results
+        
+        for start in range(0, len(misses), MAX_BATCH_SIZE):
+            idx = misses[start:start + MAX_BATCH_SIZE]
+            batch = [pairs[i] for i in idx]
+            try:
+                result = await self.async_client.chat.completions.create(
+                    **self._completion_args(self._build_batch_validation_prompt(batch), len(batch))
+                )
+                graded = self._finish_batch(result.choices[0].message.content, batch)
+            except Exception as e:
+                logger.warning(f"⚠️ Batch validation error: {str(e)[:100]}")
+                graded = [self._basic_validation(response) for _, response, _ in batch]
+            for i, validation in zip(idx, graded):
+                results[i] = validation
+        return results
+    
+    def _quick_validation(self, task: str, response: str, worker_name: str) -> Optional[Dict]:
+        """Fast-path or cached validation, or None if Groq has to grade it"""
+        if self.fast_path_enabled:
+            fast = self._fast_validation(task, response)
+            if fast is not None:
+                return self._finish_validation(fast, worker_name)
+        return self._cached_validation(task, response, worker_name)
+    
+    def _fast_validation(self, task: str, response: str) -> Optional[Dict]:
+        """
+        Grade the cases the prompt's SPECIAL CASES already pin down, locally:
+        empty replies, short replies that are just an error, and a greeting
+        answered with a greeting. Anything else returns None.
+        """
+        reply = response.strip().lower()
+        if not reply:
+            return {
+                "is_complete": False,
+                "quality_score": 0,
+                "should_retry": True,
+                "reasoning": "Empty response (fast path)",
+                "confidence": 1.0
+            }
+        if len(reply) <= FAST_PATH_MAX_ERROR_LEN and _ERROR_REPLY_RE.match(reply):
+            return {
+                "is_complete": False,
+                "quality_score": 2,
+                "should_retry": True,
+                "reasoning": "Response is an error message (fast path)",
+                "confidence": 0.9
+            }
+        if _GREETING_RE.match(task.strip().lower()) and _GREETING_RE.match(reply):
+            return {
+                "is_complete": True,
+                "quality_score": 10,
+                "should_retry": False,
+                "reasoning": "Greeting answered with a greeting (fast path)",
+                "confidence": 0.9
+            }
+        return None
+    
+    def _cached_validation(self, task: str, response: str, worker_name: str) -> Optional[Dict]:
+        """Finished validation from _validation_cache, or None on a miss"""
+        cached = _validation_cache.get(_validation_key(task, response))
+        if cached is None:
+            return None
+        try:
+            return self._finish_validation(cached, worker_name)
+        except (ValueError, TypeError):
+            # Unusable entry (e.g. written by an older version) - grade it again
+            return None
+    
+    async def _stream_validation(self, prompt: str) -> Dict:
+        """
+        Stream the grade and stop as soon as is_complete / quality_score /
+        should_retry are in and the answer is accepted; the reasoning text
+        after them is only read for answers that will be retried.
+        Groq's JSON mode can't stream, so the JSON is pulled out of plain text.
+        """
+        stream = await self.async_client.chat.completions.create(
+            **self._completion_args(prompt, stream=True)
+        )
+        buffer = ""
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                buffer += chunk.choices[0].delta.content or ""
+                early = self._early_decision(buffer)
+                if early is not None:
+                    return early
+        finally:
+            await stream.close()
+        
+        start, end = buffer.find("{"), buffer.rfind("}")
+        return orjson.loads(buffer[start:end + 1])
+    
+    @staticmethod
+    def _early_decision(buffer: str) -> Optional[Dict]:
+        """Accepting grade from a partial stream, or None to keep reading"""
+        found = {}
+        for field, pattern in _STREAM_FIELD_RES.items():
+            m = pattern.search(buffer)
+            if m is None:
+                return None
+            found[field] = m.group(1)
+        score = found["quality_score"]
+        quality = float(score) if "." in score else int(score)
+        retry = found["should_retry"] == "true"
+        if retry or quality < STREAM_ACCEPT_SCORE:
+            return None
+        return {
+            "is_complete": found["is_complete"] == "true",
+            "quality_score": quality,
+            "should_retry": False,
+            "reasoning": "Accepted (stream stopped after the score)",
+        }
+    
+    def _completion_args(self, prompt: str, n_items: int = 1, stream: bool = False) -> Dict:
+        """Groq request shared by the sync and async paths"""
+        args = {
+            "model": "llama-3.3-70b-versatile",
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": MAX_TOKENS_PER_ITEM * n_items,
+            "temperature": 0.2,
+        }
+        if stream:
+            args["stream"] = True
+        else:
+            args["response_format"] = {"type": "json_object"}
+        return args
+    
+    def _finish_batch(self, content: str, batch: List[Tuple[str, str, str]]) -> List[Dict]:
+        """Split a {"results": [...]} answer back onto the batch by id"""
+        by_id = {}
+        for item in orjson.loads(content).get("results", []):
+            if isinstance(item, dict) and "id" in item:
+                by_id[str(item.pop("id"))] = item
+        
+        results = []
+        for i, (task, response, worker_name) in enumerate(batch, 1):
+            item = by_id.get(str(i))
+            try:
+                validation = self._normalize_validation(item)
+            except (ValueError, TypeError):
+                # Model skipped or garbled this pair — fall back rather than guess
+                results.append(self._basic_validation(response))
+                continue
+            _validation_cache.put(_validation_key(task, response), validation)
+            results.append(self._finish_validation(validation, worker_name))
+        return results
+    
+    @staticmethod
+    def _normalize_validation(validation: Dict) -> Dict:
+        """
+        Grader answer -> full-key validation with defaults filled and values
+        clamped. Raises ValueError for a grade that can't be used, so only
+        well-formed grades ever reach _validation_cache.
+        """
+        if not isinstance(validation, dict):
+            raise ValueError("grade is not a JSON object")
+        
+        # Short keys from the grader (cached grades may use either form)
+        validation = {_SHORT_KEYS.get(k, k): v for k, v in validation.items()}
+        
+        # Ensure all required fields
+        validation.setdefault("is_complete", True)
+        validation.setdefault("quality_score", 7)
+        validation.setdefault("should_retry", False)
+        validation.setdefault("reasoning", "Validation complete")
+        validation.setdefault("confidence", 0.8)
+        
+        for field in ("quality_score", "confidence"):
+            value = validation[field]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{field} is not a number: {value!r}")
+        for field in ("is_complete", "should_retry"):
+            if not isinstance(validation[field], bool):
+                raise ValueError(f"{field} is not a boolean: {validation[field]!r}")
+        
+        # Normalize values
+        validation["quality_score"] = max(0, min(10, validation["quality_score"]))
+        validation["confidence"] = max(0.0, min(1.0, validation["confidence"]))
+        validation["reasoning"] = str(validation["reasoning"])
+        
+        return validation
+    
+    def _finish_validation(self, validation: Dict, worker_name: str) -> Dict:
+        """Normalize and record one validation answer"""
+        
+        validation = self._normalize_validation(validation)
+        
+        # Log validation
+        self._record({
+            "worker": worker_name,
+            "quality": validation["quality_score"],
+            "complete": validation["is_complete"],
+            "retry": validation["should_retry"]
+        })
+        
+        # Print validation result
+        self._print_validation(validation, worker_name)
+        
+        return validation
+    
     def _build_validation_prompt(self, task: str, response: str) -> str:
         """Build the validation prompt"""
         
         # Truncate long responses for validation
-        response_preview = response[:1000] + ("..." if len(response) > 1000 else "")
+        response_preview = _preview(response)
         
         prompt = f"""You are an answer quality validator. Check if this response properly answers the task.
 
@@ -95,42 +439,29 @@ ORIGINAL TASK:
 RESPONSE RECEIVED:
 "{response_preview}"
 
-EVALUATE THE RESPONSE:
-
-1. Is it COMPLETE? (Does it fully answer the task?)
-   - Yes if: Task is answered, nothing missing
-   - No if: Partial answer, missing key parts
-
-2. Quality Score (0-10):
-   - 9-10: Excellent, comprehensive, correct
-   - 7-8: Good, mostly correct
-   - 5-6: Acceptable but has issues
-   - 3-4: Poor quality, major problems
-   - 0-2: Failed, wrong, or useless
-
-3. Should RETRY?
-   - Yes if: Quality < 6 OR incomplete OR errors detected
-   - No if: Quality >= 6 AND complete
-
-4. Confidence (0.0-1.0): How sure are you of this evaluation?
-
-SPECIAL CASES:
-- If response says "error", "failed", "cannot" → quality=2, retry=true
-- If response is just a greeting for a greeting → quality=10, complete=true
-- If response is code that looks broken → quality=3, retry=true
-- If response is too short (<50 chars) for complex task → quality=4, retry=true
-
-Respond ONLY with valid JSON:
-{{
-  "is_complete": true/false,
-  "quality_score": 0-10,
-  "should_retry": true/false,
-  "reasoning": "brief explanation",
-  "confidence": 0.0-1.0
-}}"""
+{_EVALUATION_RULES}
+Respond ONLY with valid JSON, keys in this order ({_RESPONSE_LEGEND}):
+{_RESPONSE_SPEC}"""
         
         return prompt
     
+    def _build_batch_validation_prompt(self, batch: List[Tuple[str, str, str]]) -> str:
+        """One prompt grading every (task, response) pair in batch"""
+        
+        items = []
+        for i, (task, response, _) in enumerate(batch, 1):
+            response_preview = _preview(response)
+            items.append(f'[{i}]\nORIGINAL TASK:\n"{task}"\n\nRESPONSE RECEIVED:\n"{response_preview}"')
+        items_text = "\n\n".join(items)
+        
+        return f"""You are an answer quality validator. For each numbered item below, check if the response properly answers its task.
+
+{items_text}
+
+{_EVALUATION_RULES}
+Respond ONLY with valid JSON, one entry per item, using the item number as id ({_RESPONSE_LEGEND}):
+{{"results": [{{"id": 1, {_RESPONSE_SPEC[1:-1]}}}]}}"""
+    
     def _basic_validation(self, response: str) -> Dict:
         """Fallback validation without AI"""
         
@@ -152,7 +483,7 @@ Respond ONLY with valid JSON:
         }
     
     def _print_validation(self, validation: Dict, worker_name: str):
-        """Print validation results nicely"""
+        """Report validation results nicely (queued, doesn't block on stdout)"""
         
         quality = validation["quality_score"]
         complete = validation["is_complete"]
@@ -168,30 +499,41 @@ Respond ONLY with valid JSON:
         else:
             emoji = "❌"
         
-        print(f"\n   {emoji} VALIDATION RESULT:")
-        print(f"      Worker: {worker_name}")
-        print(f"      Quality: {quality}/10")
-        print(f"      Complete: {'Yes' if complete else 'No'}")
-        print(f"      Action: {'✓ Accept' if not retry else '↻ Retry Recommended'}")
-        print(f"      Reason: {validation['reasoning']}")
-        print(f"      Confidence: {validation['confidence']:.1%}")
+        logger.info(
+            f"\n   {emoji} VALIDATION RESULT:\n"
+            f"      Worker: {worker_name}\n"
+            f"      Quality: {quality}/10\n"
+            f"      Complete: {'Yes' if complete else 'No'}\n"
+            f"      Action: {'✓ Accept' if not retry else '↻ Retry Recommended'}\n"
+            f"      Reason: {validation['reasoning']}\n"
+            f"      Confidence: {validation['confidence']:.1%}"
+        )
+    
+    def _record(self, entry: Dict):
+        """Append to validation_history, keeping the running totals in step"""
+        if len(self.validation_history) == self.validation_history.maxlen:
+            evicted = self.validation_history.popleft()
+            self._quality_sum -= evicted["quality"]
+            self._retry_count -= bool(evicted["retry"])
+            self._complete_count -= bool(evicted["complete"])
+        self.validation_history.append(entry)
+        self._quality_sum += entry["quality"]
+        self._retry_count += bool(entry["retry"])
+        self._complete_count += bool(entry["complete"])
     
     def get_validation_stats(self) -> Dict:
-        """Get statistics on validations performed"""
+        """Get statistics on the last HISTORY_MAX_LEN validations"""
         
         if not self.validation_history:
             return {"total": 0}
         
         total = len(self.validation_history)
-        avg_quality = sum(v["quality"] for v in self.validation_history) / total
-        retry_count = sum(1 for v in self.validation_history if v["retry"])
-        complete_count = sum(1 for v in self.validation_history if v["complete"])
         
         return {
             "total_validations": total,
-            "avg_quality_score": round(avg_quality, 2),
-            "retry_rate": round(retry_count / total * 100, 1),
-            "completion_rate": round(complete_count / total * 100, 1)
+            "avg_quality_score": round(self._quality_sum / total, 2),
+            "retry_rate": round(self._retry_count / total * 100, 1),
+            "completion_rate": round(self._complete_count / total * 100, 1)
         }
 
 
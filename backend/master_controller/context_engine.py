@@ -3,7 +3,7 @@ Context Engine for E.V.E. Master Controller
 Uses Groq API with Llama 3.3 for intelligent context detection
 """
 
-from groq import Groq
+import re
 from typing import List, Dict, Tuple
 from core.database import get_last_n_messages
 from core.config import (
@@ -12,39 +12,50 @@ from core.config import (
     AI_MAX_TOKENS,
     REFERENCE_KEYWORDS,
     MAX_CONTEXT_MESSAGES,
-    ENABLE_CONTEXT_ENGINE
+    ENABLE_CONTEXT_ENGINE,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_ENTRIES
 )
 from master_prompts import (
     build_context_detection_prompt,
     format_conversation_history,
     parse_context_detection_response
 )
+from response_cache import LLMResultCache
+from groq_clients import get_groq, get_async_groq
 
-# Initialize Groq client
+# Initialize Groq clients (async_client for callers on the event loop)
 client = None
+async_client = None
 if GROQ_API_KEY:
     try:
-        client = Groq(api_key=GROQ_API_KEY)
+        client = get_groq(GROQ_API_KEY)
+        async_client = get_async_groq(GROQ_API_KEY)
     except Exception as e:
         print(f"⚠️  Failed to initialize Groq for context engine: {e}")
         client = None
+        async_client = None
+
+# (needs_context, reason) keyed by message + formatted history
+_detection_cache = LLMResultCache("context_detection", LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
 
 # =============================================================================
 # SIMPLE CONTEXT DETECTION (Fallback)
 # =============================================================================
 
+# One case-insensitive pass; \b keeps "it" from matching inside "with"
+# and "this" inside "thistle". Longest alternatives first.
+_REF_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for k in sorted(REFERENCE_KEYWORDS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
 def needs_context_simple(user_message: str) -> bool:
     """
     Quick keyword-based context detection
     Checks for reference words like "that", "this", "earlier"
     """
-    message_lower = user_message.lower()
-    
-    for keyword in REFERENCE_KEYWORDS:
-        if keyword in message_lower:
-            return True
-    
-    return False
+    return _REF_RE.search(user_message) is not None
 
 # =============================================================================
 # AI-POWERED CONTEXT DETECTION
@@ -72,6 +83,12 @@ def needs_context_ai(
     # Format conversation history for Llama
     history_text = format_conversation_history(conversation_history)
     
+    # Same message against the same history already classified?
+    cache_key = LLMResultCache.make_key(user_message, history_text)
+    cached = _detection_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+    
     # Build prompt
     prompt = build_context_detection_prompt(user_message, history_text)
     
@@ -87,6 +104,7 @@ def needs_context_ai(
         
         # Parse Llama's response
         needs_ctx, reason = parse_context_detection_response(result)
+        _detection_cache.put(cache_key, [needs_ctx, reason])
         
         return needs_ctx, reason
         
@@ -95,6 +113,43 @@ def needs_context_ai(
         result = needs_context_simple(user_message)
         return result, f"Fallback to keywords (error: {str(e)[:30]})"
 
+async def needs_context_ai_async(
+    user_message: str,
+    conversation_history: List[Dict]
+) -> Tuple[bool, str]:
+    """
+    needs_context_ai for async callers: awaits AsyncGroq instead of
+    blocking the event loop for the round trip
+    """
+    
+    if not async_client:
+        result = needs_context_simple(user_message)
+        return result, "Simple keyword detection (no API key)"
+    
+    history_text = format_conversation_history(conversation_history)
+    cache_key = LLMResultCache.make_key(user_message, history_text)
+    cached = _detection_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+    
+    prompt = build_context_detection_prompt(user_message, history_text)
+    
+    try:
+        response = await async_client.chat.completions.create(
+            model=MASTER_AI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=AI_MAX_TOKENS,
+            temperature=0.3
+        )
+        needs_ctx, reason = parse_context_detection_response(response.choices[0].message.content.strip())
+        _detection_cache.put(cache_key, [needs_ctx, reason])
+        return needs_ctx, reason
+        
+    except Exception as e:
+        print(f"⚠️  AI context detection error: {str(e)[:100]}")
+        result = needs_context_simple(user_message)
+        return result, f"Fallback to keywords (error: {str(e)[:30]})"
+
 # =============================================================================
 # HYBRID DETECTION (Smart Strategy)
 # =============================================================================
@@ -120,33 +175,29 @@ def needs_context(
         return False, "Context engine disabled in config"
     
     # No history? No context possible
-    if not conversation_history or len(conversation_history) == 0:
+    if not conversation_history:
         return False, "No previous conversation exists"
     
-    # Quick keyword check
-    has_keywords = needs_context_simple(user_message)
-    
-    if has_keywords:
+    # Quick keyword check (one regex pass)
+    if _REF_RE.search(user_message) is not None:
         # Keywords found, use AI to confirm if available
         if client:
             needs_ctx, reason = needs_context_ai(user_message, conversation_history)
             return needs_ctx, f"AI confirmed: {reason}"
-        else:
-            # No AI, trust keywords
-            found_keywords = [k for k in REFERENCE_KEYWORDS if k in user_message.lower()]
-            return True, f"Keywords detected: {', '.join(found_keywords[:3])}"
-    else:
-        # No keywords found
-        # But very short messages might still need context
-        word_count = len(user_message.split())
-        
-        if word_count < 5 and client:
-            # Messages like "Continue", "More details", "Explain" need AI check
-            needs_ctx, reason = needs_context_ai(user_message, conversation_history)
-            return needs_ctx, f"Short message analysis: {reason}"
-        else:
-            # Long message with no keywords → probably doesn't need context
-            return False, "No reference keywords and message is substantial"
+        # No AI, trust keywords
+        found_keywords = list(dict.fromkeys(k.lower() for k in _REF_RE.findall(user_message)))
+        return True, f"Keywords detected: {', '.join(found_keywords[:3])}"
+    
+    # No keywords found
+    # But very short messages might still need context
+    # (split at most 4 times: only "fewer than 5 words?" matters)
+    if client and len(user_message.split(None, 4)) < 5:
+        # Messages like "Continue", "More details", "Explain" need AI check
+        needs_ctx, reason = needs_context_ai(user_message, conversation_history)
+        return needs_ctx, f"Short message analysis: {reason}"
+    
+    # Long message with no keywords → probably doesn't need context
+    return False, "No reference keywords and message is substantial"
 
 # =============================================================================
 # PROMPT BUILDING WITH CONTEXT
@@ -185,12 +236,10 @@ def build_prompt_with_context(
         # No history, return simple prompt
         return current_message, 0
     
-    # Build context section
-    context_section = "=== Previous Conversation ===\n"
-    for msg in history:
-        role = msg['role'].capitalize()
-        content = msg['content']
-        context_section += f"{role}: {content}\n\n"
+    # Build context section (one join instead of += per message)
+    context_section = "=== Previous Conversation ===\n" + "".join(
+        f"{msg['role'].capitalize()}: {msg['content']}\n\n" for msg in history
+    )
     
     # Build complete prompt
     full_prompt = f"""{context_section}=== Current Request ===
@@ -214,7 +263,7 @@ def format_context_summary(conversation_id: str, limit: int = 5) -> str:
     if not history:
         return "No context available"
     
-    summary = f"Last {len(history)} messages:\n"
+    lines = [f"Last {len(history)} messages:\n"]
     for i, msg in enumerate(history, 1):
         role_emoji = "👤" if msg['role'] == 'user' else "🤖"
         
@@ -223,9 +272,9 @@ def format_context_summary(conversation_id: str, limit: int = 5) -> str:
         if len(content) > 60:
             content = content[:60] + "..."
         
-        summary += f"  {i}. {role_emoji} {content}\n"
+        lines.append(f"  {i}. {role_emoji} {content}\n")
     
-    return summary
+    return "".join(lines)
 
 # =============================================================================
 # TESTING
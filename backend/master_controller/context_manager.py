@@ -3,9 +3,99 @@ Intelligent Context Manager for E.V.E. Master
 Uses AI to understand conversation flow and select relevant context
 """
 
-from groq import Groq
-import json
+import asyncio
+import orjson
+import re
 from typing import List, Dict, Optional
+from core.config import CONTEXT_CLASSIFIER_MODEL, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES
+from response_cache import LLMResultCache
+from groq_clients import get_groq, get_async_groq
+
+# Static rulebook sent as the system message. It never changes between
+# turns, so providers with prefix caching only bill/process it once.
+_ANALYSIS_GUIDE = """Analyze if the current message needs context from previous conversation. Understand the USER'S INTENT, not just keywords.
+
+YOUR TASK:
+Determine if the current message is CONTINUING the previous conversation or starting something NEW.
+
+THINK: "Does understanding this message REQUIRE knowing what was discussed before?"
+
+CONTINUATION can be expressed in MANY ways:
+- Using reference words: "it", "this", "that", "them", "above"
+- Implied continuation: "now do X", "also Y", "make it better"
+- Follow-up questions: asking about something previously discussed
+- Requests to modify/enhance: building on previous work
+- Sequential actions: "next step", "after that", "following up"
+- Natural conversation flow: clearly connected to previous topic
+
+NEW REQUEST indicators:
+- Completely different topic
+- Fresh question unrelated to history
+- Explicit new start: "new task", "different question"
+- No logical connection to previous messages
+
+DON'T just look for specific words - UNDERSTAND the intent:
+- "make it faster" = continuation (what's "it"?)
+- "build something fast" = new request (just wants speed)
+- "improve that" = continuation (what's "that"?)
+- "improve my code" = depends on if they shared code before
+- "do the same for X" = continuation (same as what?)
+- "create X" = could be new or continuation - analyze context
+
+RELEVANT MESSAGES:
+- Only include messages that DIRECTLY help understand current request
+- Maximum 5 messages
+- Skip unrelated chatter, greetings, thanks
+- Focus on what's needed to understand "it", "this", "that" references
+- Include both question and answer if both are relevant"""
+
+_ANALYSIS_RULES = _ANALYSIS_GUIDE + """
+
+Respond with JSON only, no other fields:
+{"is_continuation": true/false, "relevant_message_indices": [0, 1, 2]}"""
+
+# Batched calls carry several numbered cases and answer in a results envelope
+_BATCH_ANALYSIS_RULES = _ANALYSIS_GUIDE + """
+
+You will get several numbered cases. Analyze each one independently; history indices are local to each case.
+Respond with JSON only, one entry per case, using the case number as id:
+{"results": [{"id": 1, "is_continuation": true/false, "relevant_message_indices": [0, 1]}]}"""
+
+# Analysis verdicts keyed by (current message, rendered history window) -
+# UI retries and agent loops re-send the same prefix turn after turn
+_analysis_cache = LLMResultCache("context_analysis", LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+
+# Cheap local gate in front of the LLM: clear-cut openers are decided here,
+# everything else (or anything that matches both ways) still goes to Groq
+_REF_RE = re.compile(r'\b(it|this|that|them|those|above|same|again)\b', re.I)
+_CONTINUE_RE = re.compile(r'^\s*(also|now|then|next|improve|make it|do the same|continue|and)\b', re.I)
+_NEWTASK_RE = re.compile(r'^\s*(new task|different|unrelated|forget)\b', re.I)
+CONTINUATION_WINDOW_S = 300
+
+# Messages shown to the analysis model; its indices refer to this window
+HISTORY_WINDOW = 10
+
+# Upper-cased role labels for prompts; unknown roles fall back to str.upper()
+_ROLE_LABELS = {"user": "USER", "assistant": "ASSISTANT", "system": "SYSTEM", "unknown": "UNKNOWN"}
+_SEPARATOR = "\n" + "─" * 60
+
+# Decision fields pulled out of a partial stream; everything after them is prose
+_STREAM_FIELD_RES = {
+    "is_continuation": re.compile(r'"is_continuation"\s*:\s*(true|false)\b'),
+    "relevant_message_indices": re.compile(r'"relevant_message_indices"\s*:\s*\[([\d,\s]*)\]'),
+}
+
+# The answer is two short fields; the cap only has to cover a chatty model
+MAX_TOKENS_PER_CASE = 200
+
+# Async callers arriving within BATCH_WINDOW_S of each other share one Groq request
+BATCH_WINDOW_S = 0.02
+MAX_BATCH_SIZE = 8
+
+
+def _role_label(msg: Dict) -> str:
+    role = msg.get('role', 'unknown')
+    return _ROLE_LABELS.get(role) or role.upper()
 
 
 class ContextManager:
@@ -17,7 +107,11 @@ class ContextManager:
     """
     
     def __init__(self, groq_api_key: str):
-        self.client = Groq(api_key=groq_api_key) if groq_api_key else None
+        self.client = get_groq(groq_api_key) if groq_api_key else None
+        self.async_client = get_async_groq(groq_api_key) if groq_api_key else None
+        self._pending: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        self.stream_analysis = True  # single analyses stop reading once the decision fields are in
     
     def analyze_context_needs(self, current_message: str, conversation_history: List[Dict]) -> Dict:
         """
@@ -35,112 +129,279 @@ class ContextManager:
                 "reasoning": "No AI or no history"
             }
         
-        # Build analysis prompt
-        prompt = self._build_context_analysis_prompt(current_message, conversation_history)
+        quick = self._heuristic_analysis(current_message, conversation_history)
+        if quick is not None:
+            print(f"\n🔍 Context Analysis (heuristic): continuation={quick['is_continuation']}")
+            return quick
+        
+        history_text = self._format_history(conversation_history)
+        cache_key = LLMResultCache.make_key(current_message, history_text)
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.2,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            
-            # Extract relevant message indices
-            relevant_indices = result.get("relevant_message_indices", [])
-            
-            # Get the actual messages
-            relevant_messages = []
-            for idx in relevant_indices:
-                if 0 <= idx < len(conversation_history):
-                    relevant_messages.append(conversation_history[idx])
-            
-            context_analysis = {
-                "is_continuation": result.get("is_continuation", False),
-                "relevant_messages": relevant_messages,
-                "context_summary": result.get("context_summary", ""),
-                "reasoning": result.get("reasoning", "AI analysis")
+            result = _analysis_cache.get(cache_key)
+            if result is None:
+                prompt = self._build_context_analysis_prompt(current_message, history_text)
+                if self.stream_analysis:
+                    result = self._stream_analysis(prompt)
+                else:
+                    response = self.client.chat.completions.create(**self._completion_args(prompt))
+                    result = orjson.loads(response.choices[0].message.content)
+                _analysis_cache.put(cache_key, result)
+            return self._finish_analysis(result, conversation_history)
+        except Exception as e:
+            return self._failed_analysis(e)
+    
+    async def analyze_context_needs_async(self, current_message: str, conversation_history: List[Dict]) -> Dict:
+        """
+        analyze_context_needs for async callers. Requests that miss the
+        heuristics and the cache are queued and coalesced with any others
+        arriving within BATCH_WINDOW_S into a single Groq call.
+        """
+        
+        if not self.async_client or not conversation_history:
+            return {
+                "is_continuation": False,
+                "relevant_messages": [],
+                "context_summary": "",
+                "reasoning": "No AI or no history"
             }
+        
+        quick = self._heuristic_analysis(current_message, conversation_history)
+        if quick is not None:
+            print(f"\n🔍 Context Analysis (heuristic): continuation={quick['is_continuation']}")
+            return quick
+        
+        history_text = self._format_history(conversation_history)
+        cache_key = LLMResultCache.make_key(current_message, history_text)
+        
+        try:
+            result = _analysis_cache.get(cache_key)
+            if result is None:
+                result = await self._submit(self._build_context_analysis_prompt(current_message, history_text))
+                _analysis_cache.put(cache_key, result)
+            return self._finish_analysis(result, conversation_history)
+        except Exception as e:
+            return self._failed_analysis(e)
+    
+    async def _submit(self, prompt: str) -> Dict:
+        """Queue one analysis prompt for the batch worker and wait for its verdict"""
+        if self._batch_task is None or self._batch_task.done():
+            self._pending = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_worker())
+        future = asyncio.get_running_loop().create_future()
+        await self._pending.put((prompt, future))
+        return await future
+    
+    async def _batch_worker(self):
+        """Drain up to MAX_BATCH_SIZE queued prompts per BATCH_WINDOW_S and analyze them together"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._pending.get()]
+            deadline = loop.time() + BATCH_WINDOW_S
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._pending.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
             
-            print(f"\n🔍 Context Analysis:")
-            print(f"   Continuation: {context_analysis['is_continuation']}")
-            print(f"   Relevant messages: {len(relevant_messages)}/{len(conversation_history)}")
-            print(f"   Summary: {context_analysis['context_summary'][:100]}...")
-            
-            return context_analysis
+            try:
+                if len(batch) == 1 and self.stream_analysis:
+                    results = [await self._stream_analysis_async(batch[0][0])]
+                elif len(batch) == 1:
+                    response = await self.async_client.chat.completions.create(
+                        **self._completion_args(batch[0][0])
+                    )
+                    results = [orjson.loads(response.choices[0].message.content)]
+                else:
+                    response = await self.async_client.chat.completions.create(
+                        **self._completion_args(self._build_batch_prompt([p for p, _ in batch]), len(batch))
+                    )
+                    by_id = {}
+                    for item in orjson.loads(response.choices[0].message.content).get("results", []):
+                        # The model may echo ids as "1" or 1.0
+                        try:
+                            by_id[int(item["id"])] = item
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                    results = [by_id.get(i) for i in range(1, len(batch) + 1)]
+            except Exception as e:
+                results = [e] * len(batch)
             
-        except Exception as e:
-            print(f"   ⚠️ Context analysis failed: {str(e)[:100]}")
-            # Even on error, use AI for basic analysis
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, dict):
+                    future.set_result(result)
+                else:
+                    future.set_exception(result or ValueError("no result for this item in batch response"))
+    
+    def _stream_analysis(self, prompt: str) -> Dict:
+        """
+        Stream one analysis and stop as soon as is_continuation and
+        relevant_message_indices are in, even if the model keeps talking
+        after them. Groq's JSON mode can't stream, so the JSON is pulled out
+        of plain text if the stream has to run to the end.
+        """
+        stream = self.client.chat.completions.create(**self._completion_args(prompt, stream=True))
+        buffer = ""
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                buffer += chunk.choices[0].delta.content or ""
+                early = self._early_analysis(buffer)
+                if early is not None:
+                    return early
+        finally:
+            stream.close()
+        
+        start, end = buffer.find("{"), buffer.rfind("}")
+        return orjson.loads(buffer[start:end + 1])
+    
+    async def _stream_analysis_async(self, prompt: str) -> Dict:
+        """_stream_analysis on the AsyncGroq client"""
+        stream = await self.async_client.chat.completions.create(
+            **self._completion_args(prompt, stream=True)
+        )
+        buffer = ""
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                buffer += chunk.choices[0].delta.content or ""
+                early = self._early_analysis(buffer)
+                if early is not None:
+                    return early
+        finally:
+            await stream.close()
+        
+        start, end = buffer.find("{"), buffer.rfind("}")
+        return orjson.loads(buffer[start:end + 1])
+    
+    @staticmethod
+    def _early_analysis(buffer: str) -> Optional[Dict]:
+        """Verdict from a partial stream once both decision fields are complete, else None"""
+        found = {}
+        for field, pattern in _STREAM_FIELD_RES.items():
+            m = pattern.search(buffer)
+            if m is None:
+                return None
+            found[field] = m.group(1)
+        return {
+            "is_continuation": found["is_continuation"] == "true",
+            "relevant_message_indices": [int(i) for i in found["relevant_message_indices"].split(",") if i.strip()],
+            "context_summary": "",
+            "reasoning": "Stream stopped after the decision fields"
+        }
+    
+    def _completion_args(self, prompt: str, n_items: int = 1, stream: bool = False) -> Dict:
+        """Groq request shared by the sync, async and batched paths"""
+        args = {
+            "model": CONTEXT_CLASSIFIER_MODEL,
+            "messages": [
+                {"role": "system", "content": _BATCH_ANALYSIS_RULES if n_items > 1 else _ANALYSIS_RULES},
+                {"role": "user", "content": prompt},
+            ],
+            "max_tokens": MAX_TOKENS_PER_CASE * n_items,
+            "temperature": 0.2,
+        }
+        if stream:
+            args["stream"] = True
+        else:
+            args["response_format"] = {"type": "json_object"}
+        return args
+    
+    def _finish_analysis(self, result: Dict, conversation_history: List[Dict]) -> Dict:
+        """Turn the model's verdict into the analysis dict callers use"""
+        
+        # Indices are positions in the window the prompt showed, not in the full history
+        window = conversation_history[-HISTORY_WINDOW:]
+        relevant_messages = [
+            window[idx] for idx in result.get("relevant_message_indices", [])
+            if isinstance(idx, int) and 0 <= idx < len(window)
+        ]
+        
+        context_analysis = {
+            "is_continuation": result.get("is_continuation", False),
+            "relevant_messages": relevant_messages,
+            "context_summary": result.get("context_summary", ""),
+            "reasoning": result.get("reasoning", "AI analysis")
+        }
+        
+        print(f"\n🔍 Context Analysis:")
+        print(f"   Continuation: {context_analysis['is_continuation']}")
+        print(f"   Relevant messages: {len(relevant_messages)}/{len(conversation_history)}")
+        if context_analysis["context_summary"]:
+            print(f"   Summary: {context_analysis['context_summary'][:100]}...")
+        
+        return context_analysis
+    
+    @staticmethod
+    def _failed_analysis(e: Exception) -> Dict:
+        print(f"   ⚠️ Context analysis failed: {str(e)[:100]}")
+        # Even on error, use AI for basic analysis
+        return {
+            "is_continuation": False,
+            "relevant_messages": [],
+            "context_summary": "Analysis unavailable - treating as new request",
+            "reasoning": "Error in AI analysis, defaulting to safe mode"
+        }
+    
+    @staticmethod
+    def _heuristic_analysis(current_message: str, history: List[Dict]) -> Optional[Dict]:
+        """
+        Decide obvious cases without the LLM:
+        - explicit new start ("new task", "forget ...") with no reference words -> new request
+        - continuation opener ("also", "make it", ...) right after the last message -> continuation
+        Returns None when the message is ambiguous.
+        """
+        continues = _CONTINUE_RE.match(current_message) is not None
+        starts_new = _NEWTASK_RE.match(current_message) is not None
+        
+        if starts_new and not continues and not _REF_RE.search(current_message):
             return {
                 "is_continuation": False,
                 "relevant_messages": [],
-                "context_summary": "Analysis unavailable - treating as new request",
-                "reasoning": "Error in AI analysis, defaulting to safe mode"
+                "context_summary": "",
+                "reasoning": "Heuristic: explicit new request"
             }
-    
-    def _build_context_analysis_prompt(self, current_message: str, history: List[Dict]) -> str:
-        """Build prompt for AI to analyze context needs"""
         
-        # Format conversation history for AI
-        history_text = ""
-        for i, msg in enumerate(history[-10:]):  # Last 10 messages max
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '')[:200]  # Truncate long messages
-            history_text += f"\n[{i}] {role.upper()}: {content}"
+        if continues and not starts_new:
+            # Age comes from the database (age_seconds), not the app's clock
+            age = history[-1].get("age_seconds")
+            if isinstance(age, (int, float)):
+                if 0 <= age < CONTINUATION_WINDOW_S:
+                    return {
+                        "is_continuation": True,
+                        "relevant_messages": history[-2:],
+                        "context_summary": "Follow-up to the previous exchange",
+                        "reasoning": "Heuristic: continuation opener right after the last message"
+                    }
         
-        prompt = f"""Analyze if the current message needs context from previous conversation. Understand the USER'S INTENT, not just keywords.
-
-CURRENT MESSAGE: "{current_message}"
-
-CONVERSATION HISTORY:{history_text}
-
-YOUR TASK:
-Determine if the current message is CONTINUING the previous conversation or starting something NEW.
-
-THINK: "Does understanding this message REQUIRE knowing what was discussed before?"
-
-CONTINUATION can be expressed in MANY ways:
-- Using reference words: "it", "this", "that", "them", "above"
-- Implied continuation: "now do X", "also Y", "make it better"
-- Follow-up questions: asking about something previously discussed
-- Requests to modify/enhance: building on previous work
-- Sequential actions: "next step", "after that", "following up"
-- Natural conversation flow: clearly connected to previous topic
-
-NEW REQUEST indicators:
-- Completely different topic
-- Fresh question unrelated to history
-- Explicit new start: "new task", "different question"
-- No logical connection to previous messages
-
-DON'T just look for specific words - UNDERSTAND the intent:
-- "make it faster" = continuation (what's "it"?)
-- "build something fast" = new request (just wants speed)
-- "improve that" = continuation (what's "that"?)
-- "improve my code" = depends on if they shared code before
-- "do the same for X" = continuation (same as what?)
-- "create X" = could be new or continuation - analyze context
-
-RELEVANT MESSAGES:
-- Only include messages that DIRECTLY help understand current request
-- Maximum 5 messages
-- Skip unrelated chatter, greetings, thanks
-- Focus on what's needed to understand "it", "this", "that" references
-- Include both question and answer if both are relevant
-
-Respond with JSON:
-{{
-  "is_continuation": true/false,
-  "relevant_message_indices": [0, 1, 2],
-  "context_summary": "what context is needed and why",
-  "reasoning": "how you determined this"
-}}"""
+        return None
+    
+    @staticmethod
+    def _format_history(history: List[Dict]) -> str:
+        """Render the last HISTORY_WINDOW messages (truncated) the way the analysis prompt shows them"""
+        return "".join(
+            f"\n[{i}] {_role_label(msg)}: {msg.get('content', '')[:200]}"
+            for i, msg in enumerate(history[-HISTORY_WINDOW:])
+        )
+    
+    def _build_context_analysis_prompt(self, current_message: str, history_text: str) -> str:
+        """Build the per-turn part of the analysis prompt (rules live in _ANALYSIS_RULES)"""
         
-        return prompt
+        return f"""CURRENT MESSAGE: "{current_message}"
+
+CONVERSATION HISTORY:{history_text}"""
+    
+    @staticmethod
+    def _build_batch_prompt(prompts: List[str]) -> str:
+        """Combine several per-turn prompts into one request with numbered cases"""
+        return "\n\n".join(f"=== CASE {i} ===\n{p}" for i, p in enumerate(prompts, 1))
     
     def build_context_for_worker(self, current_message: str, relevant_messages: List[Dict], 
                                   file_context: str = "") -> str:
@@ -161,11 +422,10 @@ Respond with JSON:
         # Add relevant conversation context
         if relevant_messages:
             context_parts.append("\n💬 RELEVANT CONVERSATION CONTEXT:")
-            for msg in relevant_messages:
-                role = msg.get('role', 'unknown')
-                content = msg.get('content', '')
-                context_parts.append(f"\n{role.upper()}: {content}")
-            context_parts.append(f"\n{'─'*60}")
+            context_parts.extend(
+                f"\n{_role_label(msg)}: {msg.get('content', '')}" for msg in relevant_messages
+            )
+            context_parts.append(_SEPARATOR)
         
         # Add current request
         context_parts.append(f"\n🎯 CURRENT REQUEST:\n{current_message}")
@@ -192,3 +452,14 @@ Respond with JSON:
         )
         
         return context_string, analysis
+    
+    async def get_smart_context_async(self, current_message: str, conversation_history: List[Dict],
+                                      file_context: str = "") -> tuple[str, Dict]:
+        """get_smart_context for async callers (batched analysis)"""
+        analysis = await self.analyze_context_needs_async(current_message, conversation_history)
+        context_string = self.build_context_for_worker(
+            current_message,
+            analysis["relevant_messages"],
+            file_context
+        )
+        return context_string, analysis
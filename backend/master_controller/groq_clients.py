@@ -0,0 +1,21 @@
+"""
+Shared Groq clients for the E.V.E. Master
+One sync and one async client per API key for the whole process, so the
+router, planner, validator and context engine reuse the same HTTP
+connection pool instead of each opening their own.
+"""
+
+from functools import lru_cache
+from groq import Groq, AsyncGroq
+
+
+@lru_cache(maxsize=4)
+def get_groq(api_key: str) -> Groq:
+    """Process-wide sync Groq client for api_key"""
+    return Groq(api_key=api_key)
+
+
+@lru_cache(maxsize=4)
+def get_async_groq(api_key: str) -> AsyncGroq:
+    """Process-wide AsyncGroq client for api_key"""
+    return AsyncGroq(api_key=api_key)
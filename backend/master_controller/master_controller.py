@@ -29,7 +29,6 @@ import requests
 import base64
 import json
 from contextlib import asynccontextmanager
-from groq import Groq
 import os
 
 # Fix Windows event loop
@@ -48,11 +47,12 @@ from core.config import MASTER_HOST, MASTER_PORT, MASTER_ID, GROQ_API_KEY
 # NEW IMPORTS
 from task_planner import TaskPlanner
 from answer_validator import AnswerValidator
-from context_manager import ContextManager
+from context_manager import ContextManager, HISTORY_WINDOW
 
 # ENHANCED SYSTEMS (v9.5)
 from worker_health_monitor import WorkerHealthMonitor
 from response_cache import ResponseCache
+from groq_clients import get_groq
 from performance_analytics import PerformanceAnalytics
 
 from workers.document_parser import parse_document
@@ -69,7 +69,7 @@ class IntelligentRouter:
     """
     
     def __init__(self, groq_api_key: str):
-        self.client = Groq(api_key=groq_api_key) if groq_api_key else None
+        self.client = get_groq(groq_api_key) if groq_api_key else None
         self.worker_stats = {}  # Simple success tracking
         
         # NEW: Add planner, validator, and context manager
@@ -506,7 +506,7 @@ async def process_message(
     file_data, file_context = await file_processor.process_uploads(files)
     
     # Get conversation history
-    history = get_last_n_messages(conversation_id, n=10)
+    history = get_last_n_messages(conversation_id, n=HISTORY_WINDOW)
     
     # STEP 1: PLAN THE TASK
     print("\n📋 STEP 1: Task Planning")
@@ -575,7 +575,7 @@ async def execute_single_step(
     
     # INTELLIGENT CONTEXT ANALYSIS
     print(f"\n📍 STEP 1: Context Analysis")
-    smart_context, context_analysis = router.context_manager.get_smart_context(
+    smart_context, context_analysis = await router.context_manager.get_smart_context_async(
         message, history, file_context
     )
     
@@ -634,9 +634,17 @@ async def execute_single_step(
                     print(f"   ⚠️ Task assignment note: {_assign_err}")
                 
                 # Send smart context to worker
-                response_text, success, duration, extra_data = worker_executor.execute(
-                    worker, message, file_data, smart_context
-                )
+                try:
+                    response_text, success, duration, extra_data = worker_executor.execute(
+                        worker, message, file_data, smart_context
+                    )
+                except Exception as e:
+                    # Record the failure so the assignment is closed and the agent freed
+                    store_execution_result(
+                        task_id, worker['agent_id'], f"Worker error: {str(e)[:100]}", False,
+                        error_message=str(e)
+                    )
+                    raise
                 worker_name = worker['agent_name']
                 
                 if success:
@@ -666,7 +674,7 @@ async def execute_single_step(
         
         # VALIDATE THE ANSWER
         print("\n📍 STEP 4: Answer Validation")
-        validation = router.validator.validate_answer(
+        validation = await router.validator.validate_answer_async(
             message, response_text, worker_name
         )
         
@@ -924,7 +932,6 @@ async def download_file(file_id: str):
         raise HTTPException(404, "File not found")
 
     file_data = _file_storage[file_id]
-    import base64
     content = base64.b64decode(file_data["content"])
 
     return Response(
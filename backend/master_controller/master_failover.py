@@ -6,11 +6,16 @@ Implements leader election and automatic failover between multiple masters
 import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    parse_datetime = None
+
 from backend.core.database import (
     register_master,
     update_master_heartbeat,
     set_active_master,
-    get_active_master,
     get_all_masters
 )
 from backend.core.config import (
@@ -19,6 +24,10 @@ from backend.core.config import (
     MASTER_TIMEOUT,
     ENABLE_MASTER_FAILOVER
 )
+from core.logger import get_logger
+
+# Steady-state ticks log at DEBUG; only role/leader changes log at INFO
+logger = get_logger("failover")
 
 # =============================================================================
 # MASTER STATE CLASS
@@ -38,12 +47,13 @@ class MasterState:
         self.master_id = master_id
         self.is_active = False
         self.last_heartbeat = None
+        self.last_leader: Optional[str] = None
         
         # Register myself in the database
         register_master(master_id)
         # Send immediate heartbeat to avoid initial timeout
         self.send_heartbeat()
-        print(f"🎯 Master {master_id} initialized and registered")
+        logger.info(f"🎯 Master {master_id} initialized and registered")
     
     def become_active(self):
         """
@@ -52,10 +62,7 @@ class MasterState:
         """
         set_active_master(self.master_id)
         self.is_active = True
-        print(f"\n{'='*60}")
-        print(f"👑 {self.master_id} is now ACTIVE")
-        print(f"   This master will process all requests")
-        print(f"{'='*60}\n")
+        logger.info(f"👑 {self.master_id} is now ACTIVE - this master will process all requests")
     
     def become_standby(self):
         """
@@ -63,7 +70,7 @@ class MasterState:
         Another master is active, we just monitor
         """
         self.is_active = False
-        print(f"⏸️  {self.master_id} is now STANDBY (monitoring only)")
+        logger.info(f"⏸️  {self.master_id} is now STANDBY (monitoring only)")
     
     def send_heartbeat(self):
         """
@@ -73,12 +80,19 @@ class MasterState:
             update_master_heartbeat(self.master_id)
             self.last_heartbeat = datetime.now(timezone.utc)
         except Exception as e:
-            print(f"❌ Failed to send heartbeat: {e}")
+            logger.error(f"❌ Failed to send heartbeat: {e}")
 
 # =============================================================================
 # LEADER ELECTION ALGORITHM
 # =============================================================================
 
+def _parse_heartbeat(value: str) -> datetime:
+    """ISO timestamp -> datetime (ciso8601 when installed; it takes a trailing Z as-is)"""
+    if parse_datetime is not None:
+        return parse_datetime(value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
 def elect_leader() -> str:
     """
     Decide which master should be active
@@ -100,77 +114,43 @@ def elect_leader() -> str:
     
     now = datetime.now(timezone.utc)
     
-    # Check if there's already an active master
+    # One pass: parse each heartbeat once -> (master_id, active, seconds since heartbeat)
+    parsed = []
     for master in all_masters:
-        if master['active']:
-            # Found active master, check if it's still alive
-            if master['last_heartbeat']:
-                try:
-                    # Parse the ISO format timestamp - may or may not have timezone
-                    last_beat_str = master['last_heartbeat']
-                    if 'T' in last_beat_str:
-                        last_beat = datetime.fromisoformat(last_beat_str.replace('Z', '+00:00'))
-                    else:
-                        # Assume UTC if no timezone
-                        last_beat = datetime.fromisoformat(last_beat_str).replace(tzinfo=timezone.utc)
-                    
-                    seconds_since_heartbeat = (now - last_beat).total_seconds()
-                    
-                    if seconds_since_heartbeat < MASTER_TIMEOUT:
-                        # Active master is still alive! Keep it
-                        return master['master_id']
-                    else:
-                        # Active master is DEAD (no heartbeat)
-                        print(f"💀 Active master {master['master_id']} appears DEAD")
-                        print(f"   No heartbeat for {seconds_since_heartbeat:.1f}s (timeout: {MASTER_TIMEOUT}s)")
-                except (ValueError, TypeError) as e:
-                    print(f"⚠️ Error parsing heartbeat timestamp: {e}")
-            # Continue to elect new leader
-    
-    # No active master OR active master is dead
-    # Find all alive masters
-    alive_masters = []
-    
-    for master in all_masters:
-        if master['last_heartbeat']:
-            try:
-                # Parse the ISO format timestamp
-                last_beat_str = master['last_heartbeat']
-                if 'T' in last_beat_str:
-                    last_beat = datetime.fromisoformat(last_beat_str.replace('Z', '+00:00'))
-                else:
-                    # Assume UTC if no timezone
-                    last_beat = datetime.fromisoformat(last_beat_str).replace(tzinfo=timezone.utc)
-                
-                seconds_since = (now - last_beat).total_seconds()
-                
-                if seconds_since < MASTER_TIMEOUT:
-                    alive_masters.append(master['master_id'])
-                    print(f"✅ {master['master_id']} is alive (heartbeat {seconds_since:.1f}s ago)")
-            except (ValueError, TypeError) as e:
-                print(f"⚠️ Error parsing heartbeat for {master['master_id']}: {e}")
+        if not master['last_heartbeat']:
+            continue
+        try:
+            last_beat = _parse_heartbeat(master['last_heartbeat'])
+            if last_beat.tzinfo is None:
+                # Assume UTC if no timezone
+                last_beat = last_beat.replace(tzinfo=timezone.utc)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"⚠️ Error parsing heartbeat for {master['master_id']}: {e}")
+            continue
+        parsed.append((master['master_id'], master['active'], (now - last_beat).total_seconds()))
+    
+    # Keep the current active master while it's still alive
+    for master_id, active, age in parsed:
+        if not active:
+            continue
+        if age < MASTER_TIMEOUT:
+            return master_id
+        logger.debug(
+            f"💀 Active master {master_id} appears DEAD - no heartbeat for "
+            f"{age:.1f}s (timeout: {MASTER_TIMEOUT}s)"
+        )
+    
+    # No active master OR active master is dead: lowest alive ID wins
+    alive_masters = sorted(master_id for master_id, _, age in parsed if age < MASTER_TIMEOUT)
     
     if alive_masters:
-        # Sort by ID and pick first (master-1 before master-2)
-        alive_masters.sort()
         elected = alive_masters[0]
-        print(f"🗳️  Elected {elected} as new leader from {len(alive_masters)} alive masters")
+        logger.debug(f"🗳️  Elected {elected} as new leader from {len(alive_masters)} alive masters")
         return elected
-    else:
-        # No alive masters found in database, elect self
-        print(f"⚠️  No alive masters found, electing self: {MASTER_ID}")
-        return MASTER_ID
     
-    if alive_masters:
-        # Sort by ID and pick first (master-1 before master-2)
-        alive_masters.sort()
-        elected = alive_masters[0]
-        print(f"🗳️  Elected {elected} as new leader from {len(alive_masters)} alive masters")
-        return elected
-    else:
-        # No alive masters found in database, elect self
-        print(f"⚠️  No alive masters found, electing self: {MASTER_ID}")
-        return MASTER_ID
+    # No alive masters found in database, elect self
+    logger.debug(f"⚠️  No alive masters found, electing self: {MASTER_ID}")
+    return MASTER_ID
 
 # =============================================================================
 # FAILOVER MONITOR (Runs continuously in background)
@@ -189,53 +169,56 @@ async def failover_monitor(master_state: MasterState):
     
     # If failover is disabled, just become active and return
     if not ENABLE_MASTER_FAILOVER:
-        print("ℹ️  Master failover DISABLED - running in single master mode")
+        logger.info("ℹ️  Master failover DISABLED - running in single master mode")
         master_state.become_active()
         
         # Still send heartbeats in background
         while True:
             try:
-                master_state.send_heartbeat()
+                await asyncio.to_thread(master_state.send_heartbeat)
             except Exception as e:
-                print(f"⚠️ Heartbeat error: {e}")
+                logger.error(f"⚠️ Heartbeat error: {e}")
             await asyncio.sleep(MASTER_HEARTBEAT_INTERVAL)
         
         return
     
-    print(f"🔍 Failover monitor started for {master_state.master_id}")
-    print(f"   Heartbeat interval: {MASTER_HEARTBEAT_INTERVAL}s")
-    print(f"   Master timeout: {MASTER_TIMEOUT}s")
+    logger.info(
+        f"🔍 Failover monitor started for {master_state.master_id} "
+        f"(heartbeat {MASTER_HEARTBEAT_INTERVAL}s, timeout {MASTER_TIMEOUT}s)"
+    )
     
     while True:
         try:
-            # Send own heartbeat
-            master_state.send_heartbeat()
-            
-            # Run leader election
-            elected_leader = elect_leader()
+            # Send own heartbeat and run leader election side by side - the
+            # election only needs our previous heartbeat to count us alive
+            _, elected_leader = await asyncio.gather(
+                asyncio.to_thread(master_state.send_heartbeat),
+                asyncio.to_thread(elect_leader),
+            )
+            if elected_leader != master_state.last_leader:
+                logger.info(f"🗳️  Leader: {master_state.last_leader or '-'} → {elected_leader}")
+                master_state.last_leader = elected_leader
             
             # Check if I should be active
             if elected_leader == master_state.master_id:
                 if not master_state.is_active:
                     # I'm elected but not active yet
-                    print(f"\n🚨 FAILOVER EVENT!")
-                    print(f"   {master_state.master_id} taking over as active master")
-                    master_state.become_active()
+                    logger.info(f"🚨 FAILOVER EVENT! {master_state.master_id} taking over as active master")
+                    await asyncio.to_thread(master_state.become_active)
             else:
                 if master_state.is_active:
                     # Someone else should be active
-                    print(f"\n⚠️  {master_state.master_id} stepping down")
-                    print(f"   {elected_leader} is now the leader")
+                    logger.info(f"⚠️  {master_state.master_id} stepping down - {elected_leader} is now the leader")
                     master_state.become_standby()
             
             # Wait before next check
             await asyncio.sleep(MASTER_HEARTBEAT_INTERVAL)
             
         except asyncio.CancelledError:
-            print(f"🛑 Failover monitor stopped for {master_state.master_id}")
+            logger.info(f"🛑 Failover monitor stopped for {master_state.master_id}")
             raise
         except Exception as e:
-            print(f"❌ Failover monitor error: {e}")
+            logger.error(f"❌ Failover monitor error: {e}")
             # Continue running even if there's an error
             await asyncio.sleep(MASTER_HEARTBEAT_INTERVAL)
 
@@ -273,7 +256,8 @@ def get_master_status() -> dict:
     """
     
     all_masters = get_all_masters()
-    active = get_active_master()
+    # Derived from the same rows instead of a second get_active_master() round-trip
+    active = next((m for m in all_masters if m['active']), None)
     
     return {
         "total_masters": len(all_masters),
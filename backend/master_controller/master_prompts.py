@@ -4,6 +4,8 @@ Optimized for groq/compound
 Updated for real workers: Image Generation, Documentation, Coding
 """
 
+import re
+
 # =============================================================================
 # TASK TYPE DETECTION PROMPT
 # =============================================================================
@@ -84,48 +86,45 @@ REASON: User says "that function" which clearly refers to code mentioned in prev
 # HELPER FUNCTIONS
 # =============================================================================
 
+# The templates are split around their placeholders once, at import; building a
+# prompt is then plain concatenation (no format-spec scan of the whole text)
+_TASK_PROMPT_HEAD, _TASK_PROMPT_TAIL = TASK_TYPE_DETECTION_PROMPT.split("{task_description}")
+_CONTEXT_PROMPT_HEAD, _rest = CONTEXT_DETECTION_PROMPT.split("{conversation_history}")
+_CONTEXT_PROMPT_MID, _CONTEXT_PROMPT_TAIL = _rest.split("{current_message}")
+del _rest
+
 def build_task_detection_prompt(task_description: str) -> str:
     """Build the task type detection prompt"""
-    return TASK_TYPE_DETECTION_PROMPT.format(
-        task_description=task_description
-    )
+    return _TASK_PROMPT_HEAD + task_description + _TASK_PROMPT_TAIL
 
 def build_context_detection_prompt(
     current_message: str,
     conversation_history: str
 ) -> str:
     """Build the context detection prompt"""
-    return CONTEXT_DETECTION_PROMPT.format(
-        current_message=current_message,
-        conversation_history=conversation_history or "No previous conversation"
-    )
+    return "".join((
+        _CONTEXT_PROMPT_HEAD,
+        conversation_history or "No previous conversation",
+        _CONTEXT_PROMPT_MID,
+        current_message,
+        _CONTEXT_PROMPT_TAIL,
+    ))
 
 # =============================================================================
 # FORMAT CONVERSATION HISTORY
 # =============================================================================
 
 def format_conversation_history(history: list) -> str:
-    """Format conversation history for AI"""
+    """Format conversation history for AI (last 3 messages, long ones truncated)"""
     
     if not history:
         return "No previous conversation"
     
-    formatted = ""
-    
-    # Take last 3 messages for context
-    recent_messages = history[-3:] if len(history) > 3 else history
-    
-    for i, msg in enumerate(recent_messages, 1):
-        role = msg['role'].capitalize()
-        
-        # Truncate very long messages
-        content = msg['content']
-        if len(content) > 150:
-            content = content[:150] + "..."
-        
-        formatted += f"{i}. {role}: {content}\n"
-    
-    return formatted.strip()
+    return "\n".join(
+        f"{i}. {msg['role'].capitalize()}: "
+        f"{msg['content'][:150] + '...' if len(msg['content']) > 150 else msg['content']}"
+        for i, msg in enumerate(history[-3:], 1)
+    ).rstrip()
 
 # =============================================================================
 # FORMAT WORKER DETAILS (Not used in always-best strategy, but kept for compatibility)
@@ -160,6 +159,15 @@ def format_worker_details(workers: dict, task_type: str) -> str:
 # PARSE AI RESPONSES
 # =============================================================================
 
+# One "KEY: value" line each; searched directly instead of splitting into lines.
+# If a key repeats, the last line wins, as it did with the line-by-line loop.
+_TASK_TYPE_RE = re.compile(r'^[ \t]*TASK_TYPE:(.*)$', re.M)
+_CONFIDENCE_RE = re.compile(r'^[ \t]*CONFIDENCE:(.*)$', re.M)
+_REASONING_RE = re.compile(r'^[ \t]*REASONING:(.*)$', re.M)
+_NEEDS_CONTEXT_RE = re.compile(r'^[ \t]*NEEDS_CONTEXT:(.*)$', re.M)
+_REASON_RE = re.compile(r'^[ \t]*REASON:(.*)$', re.M)
+_NON_NUMERIC_RE = re.compile(r'[^0-9.]')
+
 def parse_task_type_response(response_text: str) -> tuple:
     """
     Parse AI's task type detection response
@@ -171,26 +179,22 @@ def parse_task_type_response(response_text: str) -> tuple:
     confidence = 0.5
     reasoning = "AI analysis"
     
-    for line in response_text.split("\n"):
-        line = line.strip()
-        
-        if line.startswith("TASK_TYPE:"):
-            task_type = line.split("TASK_TYPE:")[1].strip().lower()
-            # Remove punctuation
-            task_type = task_type.replace(".", "").replace(",", "")
-            
-        elif line.startswith("CONFIDENCE:"):
-            try:
-                conf_str = line.split("CONFIDENCE:")[1].strip()
-                # Remove non-numeric except decimal
-                conf_str = ''.join(c for c in conf_str if c.isdigit() or c == '.')
-                confidence = float(conf_str)
-                confidence = max(0.0, min(1.0, confidence))
-            except:
-                confidence = 0.7
-                
-        elif line.startswith("REASONING:"):
-            reasoning = line.split("REASONING:")[1].strip()
+    found = _TASK_TYPE_RE.findall(response_text)
+    if found:
+        # Remove punctuation
+        task_type = found[-1].strip().lower().replace(".", "").replace(",", "")
+    
+    found = _CONFIDENCE_RE.findall(response_text)
+    if found:
+        try:
+            # Remove non-numeric except decimal
+            confidence = max(0.0, min(1.0, float(_NON_NUMERIC_RE.sub("", found[-1]))))
+        except ValueError:
+            confidence = 0.7
+    
+    found = _REASONING_RE.findall(response_text)
+    if found:
+        reasoning = found[-1].strip()
     
     return task_type, confidence, reasoning
 
@@ -201,18 +205,11 @@ def parse_context_detection_response(response_text: str) -> tuple:
     Returns: (needs_context, reason)
     """
     
-    needs_context = False
-    reason = "AI analysis"
+    found = _NEEDS_CONTEXT_RE.findall(response_text)
+    needs_context = bool(found) and "YES" in found[-1].upper()
     
-    for line in response_text.split("\n"):
-        line = line.strip()
-        
-        if line.startswith("NEEDS_CONTEXT:"):
-            answer = line.split("NEEDS_CONTEXT:")[1].strip().upper()
-            needs_context = "YES" in answer
-            
-        elif line.startswith("REASON:"):
-            reason = line.split("REASON:")[1].strip()
+    found = _REASON_RE.findall(response_text)
+    reason = found[-1].strip() if found else "AI analysis"
     
     return needs_context, reason
 
@@ -3,11 +3,86 @@ Performance Analytics System
 Tracks detailed metrics for workers and master performance
 """
 
+import copy
 import time
-from typing import Dict, List, Optional
-from collections import defaultdict
+from array import array
+from typing import Dict, List, Optional, Sequence
 import statistics
 
+# Per-worker durations / quality scores kept for the rolling stats
+STATS_WINDOW = 100
+
+# An unchanged report is reused for this long (uptime / per-minute rates still move)
+REPORT_TTL_S = 5.0
+
+
+class _RollingWindow:
+    """
+    Last `size` samples as one preallocated float64 array (8 bytes a
+    sample, no boxed floats) written ring-style, plus a running sum so
+    mean() is a single division.
+    """
+    
+    def __init__(self, size: int = STATS_WINDOW):
+        self.size = size
+        self.values = array('d', bytes(8 * size))
+        self.head = 0
+        self.count = 0
+        self.total = 0.0
+    
+    def push(self, value: float):
+        if self.count == self.size:
+            self.total -= self.values[self.head]
+        else:
+            self.count += 1
+        self.values[self.head] = value
+        self.total += value
+        self.head = (self.head + 1) % self.size
+    
+    def extend(self, values: Sequence[float]):
+        """push() for a batch: at most two slice copies, one sum per side"""
+        values = array('d', values)
+        k = len(values)
+        if k >= self.size:
+            self.values = values[k - self.size:]
+            self.head, self.count = 0, self.size
+            self.total = sum(self.values)
+            return
+        
+        # The oldest samples get overwritten once the window is full
+        evicted = max(0, self.count + k - self.size)
+        if evicted:
+            self.total -= sum(self._slots((self.head - self.count) % self.size, evicted))
+        
+        end = self.head + k
+        if end <= self.size:
+            self.values[self.head:end] = values
+        else:
+            split = self.size - self.head
+            self.values[self.head:] = values[:split]
+            self.values[:end - self.size] = values[split:]
+        
+        self.head = end % self.size
+        self.count = min(self.count + k, self.size)
+        self.total += sum(values)
+    
+    def _slots(self, start: int, n: int) -> array:
+        """n stored values starting at slot start, wrapping around"""
+        end = start + n
+        if end <= self.size:
+            return self.values[start:end]
+        return self.values[start:] + self.values[:end - self.size]
+    
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+    
+    def median(self) -> float:
+        # Order doesn't matter for the median, so the filled prefix is enough
+        return statistics.median(self.values[:self.count]) if self.count else 0
+    
+    def __len__(self) -> int:
+        return self.count
+
 
 class PerformanceAnalytics:
     """
@@ -15,15 +90,8 @@ class PerformanceAnalytics:
     """
     
     def __init__(self):
-        self.worker_metrics = defaultdict(lambda: {
-            "total_tasks": 0,
-            "successful_tasks": 0,
-            "failed_tasks": 0,
-            "total_duration": 0.0,
-            "durations": [],
-            "quality_scores": [],
-            "first_seen": time.time()
-        })
+        # Plain dict: reads never create entries, only record_worker_task does
+        self.worker_metrics: Dict[str, Dict] = {}
         
         self.master_metrics = {
             "total_requests": 0,
@@ -32,15 +100,23 @@ class PerformanceAnalytics:
             "ai_calls_made": 0,
             "cache_hits": 0,
             "avg_response_time": 0.0,
+            # Derived rates, refreshed on every record_master_request
+            "cache_hit_rate": 0.0,
+            "avg_ai_calls": 0.0,
             "start_time": time.time()
         }
         
+        # Bumped by every record_* call; the cached report is valid for one generation
+        self._gen = 0
+        self._report_cache = (None, -1, 0.0)   # (report, generation, built_at)
+        
         print("📊 Performance Analytics initialized")
     
     def record_worker_task(self, worker_name: str, success: bool, duration: float, 
                           quality_score: Optional[float] = None):
         """Record worker task execution"""
-        metrics = self.worker_metrics[worker_name]
+        self._gen += 1
+        metrics = self._worker_entry(worker_name)
         
         metrics["total_tasks"] += 1
         if success:
@@ -49,20 +125,55 @@ class PerformanceAnalytics:
             metrics["failed_tasks"] += 1
         
         metrics["total_duration"] += duration
-        metrics["durations"].append(duration)
-        
-        # Keep only last 100 durations for stats
-        if len(metrics["durations"]) > 100:
-            metrics["durations"] = metrics["durations"][-100:]
+        metrics["durations"].push(duration)
         
         if quality_score is not None:
-            metrics["quality_scores"].append(quality_score)
-            if len(metrics["quality_scores"]) > 100:
-                metrics["quality_scores"] = metrics["quality_scores"][-100:]
+            metrics["quality_scores"].push(quality_score)
+    
+    def record_worker_tasks(self, worker_name: str, successes: Sequence[bool],
+                            durations: Sequence[float], quality_scores: Optional[Sequence[float]] = None):
+        """
+        Record a batch of task executions for one worker (e.g. reported
+        together by a queue consumer): one lookup and one sum per field
+        instead of a record_worker_task call per task.
+        successes and durations are parallel; quality_scores holds only the
+        tasks that were graded, so it may be shorter.
+        """
+        if not durations:
+            return
+        self._gen += 1
+        metrics = self._worker_entry(worker_name)
+        
+        succeeded = sum(1 for ok in successes if ok)
+        metrics["total_tasks"] += len(durations)
+        metrics["successful_tasks"] += succeeded
+        metrics["failed_tasks"] += len(durations) - succeeded
+        
+        metrics["total_duration"] += sum(durations)
+        metrics["durations"].extend(durations)
+        
+        if quality_scores:
+            metrics["quality_scores"].extend(quality_scores)
+    
+    def _worker_entry(self, worker_name: str) -> Dict:
+        """Metrics dict for worker_name, created on its first record"""
+        metrics = self.worker_metrics.get(worker_name)
+        if metrics is None:
+            metrics = self.worker_metrics[worker_name] = {
+                "total_tasks": 0,
+                "successful_tasks": 0,
+                "failed_tasks": 0,
+                "total_duration": 0.0,
+                "durations": _RollingWindow(),
+                "quality_scores": _RollingWindow(),
+                "first_seen": time.time()
+            }
+        return metrics
     
     def record_master_request(self, is_multi_step: bool, duration: float, 
                              ai_calls: int = 0, cache_hit: bool = False):
         """Record master controller request"""
+        self._gen += 1
         self.master_metrics["total_requests"] += 1
         
         if is_multi_step:
@@ -75,24 +186,23 @@ class PerformanceAnalytics:
         if cache_hit:
             self.master_metrics["cache_hits"] += 1
         
-        # Update average response time
+        # Streaming mean (avg += delta / n) and the derived rates, so reads are lookups
         total = self.master_metrics["total_requests"]
-        current_avg = self.master_metrics["avg_response_time"]
-        self.master_metrics["avg_response_time"] = (
-            (current_avg * (total - 1) + duration) / total
-        )
+        self.master_metrics["avg_response_time"] += (duration - self.master_metrics["avg_response_time"]) / total
+        self.master_metrics["cache_hit_rate"] = self.master_metrics["cache_hits"] * 100.0 / total
+        self.master_metrics["avg_ai_calls"] = self.master_metrics["ai_calls_made"] / total
     
     def get_worker_stats(self, worker_name: str) -> Dict:
-        """Get detailed stats for a specific worker"""
+        """Get detailed stats for a specific worker (raw numbers; see get_worker_stats_formatted)"""
         if worker_name not in self.worker_metrics:
             return {"error": "Worker not found"}
         
         metrics = self.worker_metrics[worker_name]
         
         success_rate = (metrics["successful_tasks"] / metrics["total_tasks"] * 100) if metrics["total_tasks"] > 0 else 0
-        avg_duration = statistics.mean(metrics["durations"]) if metrics["durations"] else 0
-        median_duration = statistics.median(metrics["durations"]) if metrics["durations"] else 0
-        avg_quality = statistics.mean(metrics["quality_scores"]) if metrics["quality_scores"] else 0
+        avg_duration = metrics["durations"].mean()
+        median_duration = metrics["durations"].median()
+        avg_quality = metrics["quality_scores"].mean()
         
         uptime_minutes = (time.time() - metrics["first_seen"]) / 60
         
@@ -101,95 +211,127 @@ class PerformanceAnalytics:
             "total_tasks": metrics["total_tasks"],
             "successful_tasks": metrics["successful_tasks"],
             "failed_tasks": metrics["failed_tasks"],
-            "success_rate": f"{success_rate:.1f}%",
-            "avg_duration": f"{avg_duration:.2f}s",
-            "median_duration": f"{median_duration:.2f}s",
-            "avg_quality_score": f"{avg_quality:.1f}/10" if avg_quality > 0 else "N/A",
-            "uptime_minutes": f"{uptime_minutes:.1f}m",
-            "tasks_per_minute": f"{metrics['total_tasks'] / uptime_minutes:.2f}" if uptime_minutes > 0 else "0"
+            "success_rate": success_rate,
+            "avg_duration": avg_duration,
+            "median_duration": median_duration,
+            "avg_quality_score": avg_quality,
+            "uptime_minutes": uptime_minutes,
+            "tasks_per_minute": metrics["total_tasks"] / uptime_minutes if uptime_minutes > 0 else 0
+        }
+    
+    def get_worker_stats_formatted(self, worker_name: str) -> Dict:
+        """get_worker_stats with units, for human-facing reports"""
+        stats = self.get_worker_stats(worker_name)
+        if "error" in stats:
+            return stats
+        return {
+            **stats,
+            "success_rate": f"{stats['success_rate']:.1f}%",
+            "avg_duration": f"{stats['avg_duration']:.2f}s",
+            "median_duration": f"{stats['median_duration']:.2f}s",
+            "avg_quality_score": f"{stats['avg_quality_score']:.1f}/10" if stats["avg_quality_score"] > 0 else "N/A",
+            "uptime_minutes": f"{stats['uptime_minutes']:.1f}m",
+            "tasks_per_minute": f"{stats['tasks_per_minute']:.2f}" if stats["uptime_minutes"] > 0 else "0"
         }
     
     def get_best_worker(self, worker_type: Optional[str] = None, 
                        metric: str = "success_rate") -> Optional[str]:
         """Get best performing worker by metric"""
-        eligible_workers = {}
+        if metric == "success_rate":
+            score_of = lambda m: m["successful_tasks"] / m["total_tasks"]
+        elif metric == "speed":
+            score_of = lambda m: -m["durations"].mean()  # Negative for sorting
+        elif metric == "quality":
+            score_of = lambda m: m["quality_scores"].mean()
+        else:
+            return None
+        
+        type_filter = worker_type.lower() if worker_type else None
+        best_worker, best_score = None, None
         
         for worker_name, metrics in self.worker_metrics.items():
             # Filter by type if specified
-            if worker_type and worker_type.lower() not in worker_name.lower():
+            if type_filter and type_filter not in worker_name.lower():
                 continue
             
             # Only consider workers with at least 3 tasks
             if metrics["total_tasks"] < 3:
                 continue
             
-            if metric == "success_rate":
-                score = metrics["successful_tasks"] / metrics["total_tasks"]
-            elif metric == "speed":
-                score = -statistics.mean(metrics["durations"]) if metrics["durations"] else 0  # Negative for sorting
-            elif metric == "quality":
-                score = statistics.mean(metrics["quality_scores"]) if metrics["quality_scores"] else 0
-            else:
-                continue
-            
-            eligible_workers[worker_name] = score
+            # Single pass, first worker wins ties (same as max() over the old dict)
+            score = score_of(metrics)
+            if best_score is None or score > best_score:
+                best_worker, best_score = worker_name, score
         
-        if not eligible_workers:
-            return None
-        
-        return max(eligible_workers, key=eligible_workers.get)
+        return best_worker
     
     def get_master_stats(self) -> Dict:
-        """Get master controller statistics"""
+        """Get master controller statistics (raw numbers; see get_master_stats_formatted)"""
         uptime_minutes = (time.time() - self.master_metrics["start_time"]) / 60
         requests_per_minute = self.master_metrics["total_requests"] / uptime_minutes if uptime_minutes > 0 else 0
         
-        cache_hit_rate = (self.master_metrics["cache_hits"] / self.master_metrics["total_requests"] * 100) \
-                        if self.master_metrics["total_requests"] > 0 else 0
-        
-        avg_ai_calls = self.master_metrics["ai_calls_made"] / self.master_metrics["total_requests"] \
-                      if self.master_metrics["total_requests"] > 0 else 0
-        
         return {
             "total_requests": self.master_metrics["total_requests"],
             "single_step": self.master_metrics["single_step_requests"],
             "multi_step": self.master_metrics["multi_step_requests"],
-            "avg_response_time": f"{self.master_metrics['avg_response_time']:.2f}s",
-            "requests_per_minute": f"{requests_per_minute:.2f}",
+            "avg_response_time": self.master_metrics["avg_response_time"],
+            "requests_per_minute": requests_per_minute,
             "total_ai_calls": self.master_metrics["ai_calls_made"],
-            "avg_ai_calls_per_request": f"{avg_ai_calls:.2f}",
+            "avg_ai_calls_per_request": self.master_metrics["avg_ai_calls"],
             "cache_hits": self.master_metrics["cache_hits"],
-            "cache_hit_rate": f"{cache_hit_rate:.1f}%",
-            "uptime_minutes": f"{uptime_minutes:.1f}m"
+            "cache_hit_rate": self.master_metrics["cache_hit_rate"],
+            "uptime_minutes": uptime_minutes
         }
     
-    def get_comprehensive_report(self) -> Dict:
-        """Get full system performance report"""
+    def get_master_stats_formatted(self) -> Dict:
+        """get_master_stats with units, for human-facing reports"""
+        stats = self.get_master_stats()
         return {
-            "master": self.get_master_stats(),
+            **stats,
+            "avg_response_time": f"{stats['avg_response_time']:.2f}s",
+            "requests_per_minute": f"{stats['requests_per_minute']:.2f}",
+            "avg_ai_calls_per_request": f"{stats['avg_ai_calls_per_request']:.2f}",
+            "cache_hit_rate": f"{stats['cache_hit_rate']:.1f}%",
+            "uptime_minutes": f"{stats['uptime_minutes']:.1f}m"
+        }
+    
+    def get_comprehensive_report(self) -> Dict:
+        """
+        Get full system performance report (formatted - it feeds /diagnostics).
+        Polls with no new records in
+        between get a copy of the previous report (for up to REPORT_TTL_S).
+        """
+        report, gen, built_at = self._report_cache
+        now = time.time()
+        if gen == self._gen and now - built_at < REPORT_TTL_S:
+            return copy.deepcopy(report)
+        
+        report = {
+            "master": self.get_master_stats_formatted(),
             "workers": {
-                worker_name: self.get_worker_stats(worker_name)
+                worker_name: self.get_worker_stats_formatted(worker_name)
                 for worker_name in self.worker_metrics.keys()
             },
             "recommendations": self._generate_recommendations()
         }
+        self._report_cache = (report, self._gen, now)
+        return copy.deepcopy(report)
     
     def _generate_recommendations(self) -> List[str]:
         """Generate performance recommendations"""
         recommendations = []
         
-        # Check for underperforming workers
-        for worker_name, metrics in self.worker_metrics.items():
-            if metrics["total_tasks"] >= 5:
-                success_rate = metrics["successful_tasks"] / metrics["total_tasks"]
-                if success_rate < 0.7:
-                    recommendations.append(
-                        f"⚠️ Worker {worker_name} has low success rate ({success_rate*100:.0f}%) - consider investigation"
-                    )
+        # Check for underperforming workers (success rate < 70%, compared in integers;
+        # the rate itself is only computed for the few workers that get flagged)
+        recommendations.extend(
+            f"⚠️ Worker {worker_name} has low success rate "
+            f"({metrics['successful_tasks'] / metrics['total_tasks'] * 100:.0f}%) - consider investigation"
+            for worker_name, metrics in self.worker_metrics.items()
+            if metrics["total_tasks"] >= 5 and metrics["successful_tasks"] * 10 < metrics["total_tasks"] * 7
+        )
         
         # Check AI call efficiency
-        avg_ai_calls = self.master_metrics["ai_calls_made"] / self.master_metrics["total_requests"] \
-                      if self.master_metrics["total_requests"] > 0 else 0
+        avg_ai_calls = self.master_metrics["avg_ai_calls"]
         if avg_ai_calls > 3.5:
             recommendations.append(
                 f"💡 High AI call rate ({avg_ai_calls:.1f}/request) - consider batching or caching"
@@ -202,8 +344,7 @@ class PerformanceAnalytics:
             )
         
         # Check cache effectiveness
-        cache_hit_rate = (self.master_metrics["cache_hits"] / self.master_metrics["total_requests"] * 100) \
-                        if self.master_metrics["total_requests"] > 0 else 0
+        cache_hit_rate = self.master_metrics["cache_hit_rate"]
         if cache_hit_rate < 10 and self.master_metrics["total_requests"] > 20:
             recommendations.append(
                 f"💡 Low cache hit rate ({cache_hit_rate:.0f}%) - queries may be too unique"
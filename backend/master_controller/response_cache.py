@@ -4,9 +4,13 @@ Caches AI responses for duplicate queries to improve speed and reduce API calls
 """
 
 import hashlib
+import sqlite3
+import threading
 import time
-from typing import Optional, Dict, Tuple, List
+from collections import OrderedDict
+from typing import Any, Optional, Dict, Tuple, List
 import json
+import orjson
 
 
 class ResponseCache:
@@ -150,3 +154,105 @@ class ResponseCache:
             }
             for _, entry in sorted_entries
         ]
+
+
+class LLMResultCache:
+    """
+    Exact-match cache for the JSON answers of LLM classification calls
+    (answer validation, context detection). An in-memory LRU sits in front
+    of a SQLite table, so hits survive restarts. Keep one instance per
+    namespace; they can share a file.
+    """
+    
+    def __init__(self, namespace: str, path: str = "", max_entries: int = 10_000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts = 0
+        # Keys read from the table since the last write: their used_at is
+        # bumped with the next put's commit instead of a write per read
+        self._touched: Dict[str, float] = {}
+        
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {namespace} "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, used_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache '{namespace}' not persisted ({e}) - using memory only")
+                self._db = None
+    
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """md5 over the whitespace-trimmed parts"""
+        return hashlib.md5("\x1f".join(p.strip() for p in parts).encode()).hexdigest()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value (a fresh copy) or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                if self._db is not None:
+                    self._touch(key)
+                return orjson.loads(orjson.dumps(self._memory[key]))
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    f"SELECT value FROM {self.namespace} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+            except sqlite3.Error:
+                return None
+            self._touch(key)
+            self._remember(key, orjson.loads(row[0]))
+            return orjson.loads(row[0])
+    
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        encoded = orjson.dumps(value).decode()
+        with self._lock:
+            self._remember(key, orjson.loads(encoded))
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.namespace} (key, value, used_at) VALUES (?, ?, ?)",
+                    (key, encoded, time.time())
+                )
+                self._puts += 1
+                if self._touched:
+                    # Recency of cache hits, flushed in the same commit
+                    self._db.executemany(
+                        f"UPDATE {self.namespace} SET used_at = ? WHERE key = ?",
+                        [(used_at, k) for k, used_at in self._touched.items()]
+                    )
+                    self._touched.clear()
+                # Trim the table back to max_entries now and then, not on every write
+                if self._puts % 500 == 0:
+                    self._db.execute(
+                        f"DELETE FROM {self.namespace} WHERE key NOT IN "
+                        f"(SELECT key FROM {self.namespace} ORDER BY used_at DESC LIMIT ?)",
+                        (self.max_entries,)
+                    )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache '{self.namespace}' write failed: {e}")
+    
+    def _touch(self, key: str):
+        self._touched[key] = time.time()
+        if len(self._touched) > self.max_entries:
+            self._touched.pop(next(iter(self._touched)))
+    
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -3,10 +3,10 @@ Task Planner for E.V.E. Master v9.0
 Breaks complex tasks into sequential steps
 """
 
-from groq import Groq
 import json
 from typing import List, Dict, Optional
 from core.config import GROQ_API_KEY
+from groq_clients import get_groq
 
 
 class TaskPlanner:
@@ -16,7 +16,7 @@ class TaskPlanner:
     """
 
     def __init__(self, groq_api_key: str):
-        self.client = Groq(api_key=groq_api_key) if groq_api_key else None
+        self.client = get_groq(groq_api_key) if groq_api_key else None
 
     def plan_task(self, message: str, files: List[Dict] = None) -> Dict:
         """